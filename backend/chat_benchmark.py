@@ -0,0 +1,100 @@
+"""
+latency of typical endpoint queries on the materialised chat table vs the old read_parquet glob view.
+    python -m backend.chat_benchmark [--repeat 5] [--rebuild]
+"""
+import argparse
+import statistics
+import time
+
+from backend.data_loader import sync_chat_table, CLEAN_PARQUET_GLOB
+from backend.db_pool import write_connection
+from backend.chat_partition import create_hive_view
+
+# the chat view as it was defined before the table
+PARQUET_VIEW_SQL = f"""
+    CREATE OR REPLACE TEMP VIEW chat_parquet AS
+    SELECT
+        *,
+        CAST(year AS INTEGER) AS year,
+        CAST(month AS INTEGER) AS month,
+        CAST(quarter AS INTEGER) AS quarter,
+        CAST(group_id AS VARCHAR) AS group_id
+    FROM read_parquet('{CLEAN_PARQUET_GLOB}', union_by_name=true)
+"""
+
+# {chat} is replaced by the table or the view, {groups} / {year} / {month} from the data
+QUERIES = {
+    "group list": "SELECT DISTINCT group_id FROM {chat} ORDER BY group_id",
+    "keyword frequency (year, 12 groups)": """
+        SELECT token, COUNT(*) FROM (
+            SELECT unnest(string_split(clean_text, ' ')) AS token FROM {chat}
+            WHERE clean_text IS NOT NULL AND year = {year} AND group_id IN ({groups})
+        ) GROUP BY token ORDER BY 2 DESC LIMIT 50
+    """,
+    "messages of one group / month": """
+        SELECT datetime, user, clean_text FROM {chat}
+        WHERE group_id = {group} AND year = {year} AND month = {month}
+    """,
+    "row_id window (1 group)": """
+        SELECT group_id, row_number() OVER (PARTITION BY group_id ORDER BY datetime) AS row_id, clean_text
+        FROM {chat} WHERE group_id = {group}
+    """,
+    "one month, all groups": """
+        SELECT group_id, COUNT(*) FROM {chat}
+        WHERE {year_col} = {year} AND {month_col} = {month} GROUP BY group_id
+    """,
+    "time range (1 week)": """
+        SELECT COUNT(*) FROM {chat}
+        WHERE datetime BETWEEN TIMESTAMP '{day}' AND TIMESTAMP '{day}' + INTERVAL 7 DAY
+    """,
+}
+
+
+def _time(con, sql: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        con.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run_benchmark(repeat: int = 5, rebuild: bool = False) -> list:
+    """median ms per query, parquet view vs chat table"""
+    with write_connection() as con:
+        sync_chat_table(con, full=rebuild)
+        con.execute(PARQUET_VIEW_SQL)
+        group_ids = [g for (g,) in con.execute("SELECT DISTINCT group_id FROM chat ORDER BY group_id").fetchall()]
+        year, month, day = con.execute(
+            "SELECT year, month, CAST(datetime AS DATE) FROM chat WHERE group_id = ? LIMIT 1",
+            [group_ids[-1]]).fetchone()
+        values = {
+            "groups": ", ".join(f"'{g}'" for g in group_ids[-12:]),
+            "group": f"'{group_ids[-1]}'",
+            "year": year, "month": month, "day": day,
+        }
+        columns = {"year_col": "year", "month_col": "month"}
+        # msg_year=/msg_month= partitions (python -m backend.chat_partition), pruned by directory
+        has_hive = create_hive_view(con)
+        rows = []
+        for name, sql in QUERIES.items():
+            view_ms = _time(con, sql.format(chat="chat_parquet", **columns, **values), repeat)
+            table_ms = _time(con, sql.format(chat="chat", **columns, **values), repeat)
+            row = {"query": name, "parquet_view_ms": round(view_ms, 1), "table_ms": round(table_ms, 1),
+                   "speedup": round(view_ms / table_ms, 1) if table_ms > 0 else None}
+            if has_hive and "{month_col}" in sql:
+                hive_sql = sql.format(chat="chat_hive", year_col="msg_year", month_col="msg_month", **values)
+                row["hive_view_ms"] = round(_time(con, hive_sql, repeat), 1)
+            rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="chat table vs parquet view query latency")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the chat table from scratch first")
+    args = parser.parse_args()
+    for row in run_benchmark(args.repeat, args.rebuild):
+        hive = f"   hive view {row['hive_view_ms']:>8} ms" if "hive_view_ms" in row else ""
+        print(f"{row['query']:<40} view {row['parquet_view_ms']:>8} ms   table {row['table_ms']:>8} ms   "
+              f"x{row['speedup']}{hive}")
@@ -0,0 +1,255 @@
+"""
+one parser for all whatsapp export formats.
+the format is sniffed from the first lines of the file, then a single pass over the lines
+matches the message header regex of that format, lines without a header are folded
+into the previous message (multi-line messages).
+
+    android: 06/01/2025, 13:03 - +65 9635 7039: Hi there
+    ios:     [06/01/25, 13:03:10] ~ Alice: Hi there
+"""
+import re
+import sys
+import time
+from datetime import datetime
+from itertools import chain, compress, islice
+
+import pandas as pd
+
+# lines looked at to decide the format of a file
+SNIFF_LINES = 200
+BATCH_SIZE = 50_000
+
+_DATE = r"(\d{1,2}/\d{1,2}/\d{2,4})"
+_TIME = r"(\d{1,2}:\d{2}(?::\d{2})?)"
+
+# -----------------------------
+# system messages
+# -----------------------------
+SYSTEM_MSG_PATTERN = re.compile(r"(joined|left|added|changed|requested)", re.IGNORECASE)
+SECURITY_CODE_PATTERN = re.compile(r"your security code with .*? changed", re.IGNORECASE)
+
+def _android_keep(entries):
+    # "13:03 - Alice joined using this group's invite link" has no user part
+    search = SYSTEM_MSG_PATTERN.search
+    return [user is not None and search(text) is None for _, _, user, text in entries]
+
+def _ios_keep(entries):
+    search = SECURITY_CODE_PATTERN.search
+    # "[..] ~ Alice: Alice joined using this group's invite link"
+    # "‎[..] SG Mums: ‎Messages and calls are end-to-end encrypted." system notices (and media
+    # placeholders) start with U+200E, matched as headers so they are not folded into the previous message
+    return [user is not None and search(text) is None and user.strip().lower() not in text.strip().lower()
+            and not text.startswith("\u200e")
+            for _, _, user, text in entries]
+
+# -----------------------------
+# formats, one header regex each
+# -----------------------------
+# groups: date, time, user (None for system lines), text of the first line
+# keep: which header matches are real messages (system messages dropped)
+FORMATS = {
+    "android": {
+        "pattern": re.compile(rf"^{_DATE},\s*{_TIME}\s*-\s*(?:(.*?):\s*)?(.*)$"),
+        "keep": _android_keep,
+    },
+    "ios": {
+        "pattern": re.compile(rf"^\u200e?\[{_DATE},\s*{_TIME}\]\s*(?:~\s*)?(?:(.*?):\s*)?(.*)$"),
+        "keep": _ios_keep,
+    },
+}
+
+def sniff_format(lines):
+    """
+    name of the format matching most of the given lines and its datetime format,
+    e.g. ("android", "%d/%m/%Y, %H:%M"), None if no line looks like a message
+    """
+    best, best_hits, first = None, 0, None
+    for name, fmt in FORMATS.items():
+        matches = [m for m in map(fmt["pattern"].match, lines) if m]
+        if len(matches) > best_hits:
+            best, best_hits, first = name, len(matches), matches[0]
+    if best is None:
+        return None
+    date_str, time_str = first.group(1), first.group(2)
+    date_fmt = "%d/%m/%Y" if len(date_str.rsplit("/", 1)[-1]) == 4 else "%d/%m/%y"
+    time_fmt = "%H:%M:%S" if time_str.count(":") == 2 else "%H:%M"
+    return best, f"{date_fmt}, {time_fmt}"
+
+# -----------------------------
+# single pass parse
+# -----------------------------
+def parse_datetime(date_str, time_str, dt_format: str) -> pd.Series:
+    """
+    date and time strings -> datetime, each distinct date / time is parsed only once
+    (a chat has a few hundred days and at most 86400 times of day, but millions of messages)
+    """
+    date_fmt, time_fmt = dt_format.split(", ")
+    date_codes, dates = pd.factorize(pd.Series(date_str))
+    time_codes, times = pd.factorize(pd.Series(time_str))
+    dates = pd.to_datetime(dates, format=date_fmt, errors="coerce")
+    times = pd.to_datetime(times, format=time_fmt, errors="coerce") - pd.Timestamp(1900, 1, 1)
+    return pd.Series(dates.take(date_codes) + times.take(time_codes))
+
+def _build_frame(entries, extra, keep, dt_format) -> pd.DataFrame:
+    """header matches + folded continuation lines -> DataFrame(datetime, user, text)"""
+    kept = keep(entries)
+    for i, more in extra.items():
+        if kept[i]:
+            date_str, time_str, user, text = entries[i]
+            entries[i] = (date_str, time_str, user, "\n".join(chain((text,), more)))
+    rows = list(compress(entries, kept))
+    if not rows:
+        return pd.DataFrame(columns=["datetime", "user", "text"])
+    date_str, time_str, user, text = zip(*rows)
+    df = pd.DataFrame({
+        "datetime": parse_datetime(date_str, time_str, dt_format),
+        "user": pd.Series(user).str.strip(),
+        "text": pd.Series(text).str.strip(),
+    })
+    # header matched but date is not valid for this file format
+    return df[df["datetime"].notna()].reset_index(drop=True)
+
+def iter_message_frames(lines, batch_size: int = BATCH_SIZE, chat_format=None):
+    """
+    parse chat lines in one pass, yield DataFrame(datetime, user, text) per batch of lines.
+    the last message of a batch is carried over to the next one (it may continue there),
+    so a multi-line message never spans two frames.
+    chat_format: (format name, datetime format), sniffed from the first lines if None
+    """
+    lines = iter(lines)
+    if chat_format is None:
+        head = list(islice(lines, SNIFF_LINES))
+        chat_format = sniff_format(head)
+        if chat_format is None:
+            return
+        lines = chain(head, lines)
+    name, dt_format = chat_format
+    fmt = FORMATS[name]
+    match, keep = fmt["pattern"].match, fmt["keep"]
+
+    entries, extra = [], {}
+    while True:
+        chunk = list(islice(lines, batch_size))
+        if not chunk:
+            break
+        matches = list(map(match, chunk))
+        if None not in matches:
+            # no continuation line in this chunk, the common case
+            entries += [m.groups() for m in matches]
+        else:
+            for line, m in zip(chunk, matches):
+                if m is not None:
+                    entries.append(m.groups())
+                elif entries:
+                    # continuation of the previous message (lines before the first message are dropped)
+                    extra.setdefault(len(entries) - 1, []).append(line.rstrip("\r\n"))
+        if len(entries) > 1:
+            last, last_extra = entries.pop(), extra.pop(len(entries), None)
+            yield _build_frame(entries, extra, keep, dt_format)
+            entries, extra = [last], ({0: last_extra} if last_extra else {})
+    if entries:
+        yield _build_frame(entries, extra, keep, dt_format)
+
+def parse_lines(lines, chat_format=None) -> pd.DataFrame:
+    """whole chat in one DataFrame(datetime, user, text)"""
+    frames = [df for df in iter_message_frames(lines, chat_format=chat_format) if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=["datetime", "user", "text"])
+    return pd.concat(frames, ignore_index=True)
+
+# -----------------------------
+# benchmark
+# -----------------------------
+# the per-line parsers chat_parser replaced, only to measure the speedup against
+# (as they were, except a line with a bad date is skipped instead of stopping the benchmark)
+def _old_android_loop(lines, group_name="benchmark"):
+    """ingestion_second.parse_txt_lines before chat_parser"""
+    pattern = re.compile(
+        r"^(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?)\s*-\s*(.*?):\s*(.*)$"
+    )
+    records = []
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            date_str, time_str, user, message = match.groups()
+            dt = None
+            for fmt in ("%d/%m/%Y, %H:%M", "%d/%m/%y, %H:%M"):
+                try:
+                    dt = datetime.strptime(f"{date_str}, {time_str}", fmt)
+                    break
+                except ValueError:
+                    continue
+            if not dt:
+                continue
+            if re.search(r"(joined|left|added|changed|requested)", message.lower()):
+                continue
+            records.append({"datetime": dt, "user": user.strip(), "text": message.strip(),
+                            "group_name": group_name})
+    return records
+
+def _old_ios_loop(lines, group_name="benchmark"):
+    """ingesion.parse_txt_lines before chat_parser"""
+    pattern = re.compile(r"\[(.*?)\]\s*~\s*(.*?):\s*(.*)")
+    records = []
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            dt_str, user, message = match.groups()
+            try:
+                dt = datetime.strptime(dt_str, "%d/%m/%y, %H:%M:%S")
+            except ValueError:
+                continue
+            if re.search(r"your security code with .*? changed", message.lower()):
+                continue
+            if str(user).strip().lower() in str(message).strip().lower():
+                continue
+            records.append({"datetime": dt, "user": user.strip(), "text": message.strip(),
+                            "group_name": group_name})
+    return records
+
+OLD_PARSERS = {"android": ("ingestion_second.parse_txt_lines", _old_android_loop),
+               "ios": ("ingesion.parse_txt_lines", _old_ios_loop)}
+
+def _best_of(parse, lines, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark(lines, repeat: int = 3) -> dict:
+    """
+    best-of-n parse throughput of a list of lines + how many continuation lines were folded,
+    next to both old per-line parsers on the same lines (the one of the other format finds ~0 messages).
+    speedup is against the old parser of the sniffed format
+    """
+    chat_format = sniff_format(lines[:SNIFF_LINES])
+    best, df = _best_of(lambda ls: parse_lines(ls, chat_format), lines, repeat)
+    old = {}
+    for name, parse in OLD_PARSERS.values():
+        seconds, records = _best_of(parse, lines, repeat)
+        old[name] = {
+            "messages": len(records),
+            "seconds": round(seconds, 3),
+            "messages_per_sec": round(len(records) / seconds, 1) if seconds > 0 else None,
+        }
+    baseline = old[OLD_PARSERS[chat_format[0]][0]]["seconds"] if chat_format else None
+    return {
+        "format": chat_format,
+        "lines": len(lines),
+        "messages": len(df),
+        "multiline_messages": int(df["text"].str.contains("\n", regex=False).sum()) if len(df) else 0,
+        "seconds": round(best, 3),
+        "messages_per_sec": round(len(df) / best, 1) if best > 0 else None,
+        "old_parsers": old,
+        "speedup": round(baseline / best, 1) if baseline and best > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    # python -m backend.chat_parser "data/chat_zip/2025/WhatsApp Chat - 2025 DEC SG Mummys.zip"
+    from backend.ingestion_second import iter_zip_lines
+    for path in sys.argv[1:]:
+        print(path, benchmark(list(iter_zip_lines(path))))
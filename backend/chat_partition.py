@@ -0,0 +1,163 @@
+"""
+hive partitioned copy of the clean chats:
+    clean_chat_hive/msg_year=2025/msg_month=3/group_202503.parquet
+the flat clean_chat_df/{group_year}/group_{id}.parquet files stay the source of truth
+(delta append / re-clean / manifest work on them), the partitions are derived from them.
+
+opt-in with CHAT_LAYOUT=hive: uploads / re-cleans also write the partitions of the months they touch,
+and chat is a hive_partitioning view over them instead of the native table.
+the default CHAT_LAYOUT=table keeps the sorted duckdb table, which was faster in chat_benchmark,
+and nothing is written here. existing data / bring the partitions up to date:
+    python -m backend.chat_partition [--force]
+"""
+import os
+import glob
+import time
+import argparse
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from backend.cleaning import CLEAN_SCHEMA, tokenize_clean
+
+# ========================================
+# ⚙️  CONFIG
+# ========================================
+FLAT_BASE = "data/processing_output/clean_chat_df"
+HIVE_BASE = "data/processing_output/clean_chat_hive"
+HIVE_GLOB = f"{HIVE_BASE}/*/*/*.parquet"
+CHAT_LAYOUT = os.getenv("CHAT_LAYOUT", "table")   # "table" or "hive"
+
+
+def hive_enabled() -> bool:
+    return CHAT_LAYOUT == "hive"
+
+
+def partition_path(group_id, year: int, month: int, base: str = HIVE_BASE) -> str:
+    return os.path.join(base, f"msg_year={year}", f"msg_month={month}", f"group_{group_id}.parquet")
+
+
+def group_partitions(group_id, base: str = HIVE_BASE) -> list:
+    """existing partition files of one group"""
+    return glob.glob(os.path.join(base, "*", "*", f"group_{group_id}.parquet"))
+
+
+# ========================================
+# 🧩 write
+# ========================================
+def conform_clean_table(table: pa.Table) -> pa.Table:
+    """
+    cast to CLEAN_SCHEMA, so every partition has the same columns and the view does not need
+    union_by_name (which opens the footer of every file). columns missing in old clean files are derived
+    """
+    columns = []
+    derived = None
+    for field in CLEAN_SCHEMA:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        elif field.name in ("tokens", "tokens_singular"):
+            if derived is None:
+                derived = dict(zip(("tokens", "tokens_singular"),
+                                   tokenize_clean(table.column("clean_text").combine_chunks())))
+            columns.append(derived[field.name].cast(field.type))
+        elif field.name == "msg_seq":
+            # a flat clean file holds the whole group in order
+            columns.append(pa.array(range(1, len(table) + 1), field.type))
+        else:
+            columns.append(pa.nulls(len(table), field.type))
+    return pa.Table.from_arrays(columns, schema=CLEAN_SCHEMA)
+
+
+def write_partitioned(clean_path: str, group_id, months=None, base: str = HIVE_BASE) -> int:
+    """
+    split one clean group file into its (year, month) partitions.
+    months: only rewrite these (year, month) pairs, only their rows are read from the group file.
+    None rewrites the whole group and removes partitions the group no longer has.
+    return number of partition files written
+    """
+    filters = None
+    if months is not None:
+        if not months:
+            return 0
+        filters = [[("year", "=", y), ("month", "=", m)] for y, m in sorted(months)]
+    table = conform_clean_table(pq.read_table(clean_path, filters=filters))
+    keys = pc.add(pc.multiply(table.column("year").cast(pa.int32()), 100), table.column("month").cast(pa.int32()))
+    wanted = None if months is None else {y * 100 + m for y, m in months}
+    written = set()
+    for key in pc.unique(keys).to_pylist():
+        if key is None or (wanted is not None and key not in wanted):
+            continue
+        year, month = divmod(key, 100)
+        path = partition_path(group_id, year, month, base)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table.filter(pc.equal(keys, key)), tmp_path)
+        os.replace(tmp_path, path)
+        written.add(os.path.normpath(path))
+    if months is None:
+        for path in group_partitions(group_id, base):
+            if os.path.normpath(path) not in written:
+                os.remove(path)
+    return len(written)
+
+
+def delta_months(delta_clean_path: str) -> set:
+    """(year, month) pairs present in a cleaned delta file, from its year / month columns only"""
+    table = pq.read_table(delta_clean_path, columns=["year", "month"])
+    return {(y, m) for y, m in zip(table.column("year").to_pylist(), table.column("month").to_pylist())}
+
+
+def _is_current(clean_path: str, group_id, base: str) -> bool:
+    """every partition of the group is newer than the flat file"""
+    parts = group_partitions(group_id, base)
+    mtime = os.stat(clean_path).st_mtime_ns
+    return bool(parts) and all(os.stat(p).st_mtime_ns >= mtime for p in parts)
+
+
+# ========================================
+# 🔁 migration
+# ========================================
+def migrate_to_hive(flat_base: str = FLAT_BASE, base: str = HIVE_BASE, force: bool = False) -> dict:
+    """write the partitions of every flat clean file, groups already partitioned are skipped"""
+    start = time.perf_counter()
+    files = sorted(glob.glob(os.path.join(flat_base, "*", "group_*.parquet")))
+    migrated, skipped, partitions = 0, 0, 0
+    for clean_path in files:
+        group_id = os.path.basename(clean_path)[len("group_"):-len(".parquet")]
+        if not force and _is_current(clean_path, group_id, base):
+            skipped += 1
+            continue
+        partitions += write_partitioned(clean_path, group_id, base=base)
+        migrated += 1
+    report = {
+        "files": len(files),
+        "migrated": migrated,
+        "skipped": skipped,
+        "partitions": partitions,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    print(f"✅ {migrated} groups partitioned into {partitions} files, {skipped} already current "
+          f"({report['seconds']}s)")
+    return report
+
+
+# ========================================
+# 🔍 view
+# ========================================
+def create_hive_view(con, name: str = "chat_hive"):
+    """view over the partitions, msg_year / msg_month filters prune directories"""
+    if not glob.glob(HIVE_GLOB):
+        return False
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {name} AS
+        SELECT * FROM read_parquet('{HIVE_GLOB}', hive_partitioning=true)
+    """)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="migrate clean_chat_df to the msg_year=/msg_month= layout")
+    parser.add_argument("--force", action="store_true", help="rewrite partitions of every group")
+    args = parser.parse_args()
+    migrate_to_hive(force=args.force)
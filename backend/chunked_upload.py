@@ -0,0 +1,216 @@
+"""
+resumable chunked upload for large chat archives:
+init -> PUT numbered chunks (each with its sha256) -> complete.
+every verified chunk is kept on disk, so an interrupted upload resumes from the missing ones.
+"""
+import os
+import re
+import json
+import math
+import uuid
+import shutil
+import hashlib
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+
+# ========================================
+# ⚙️  CONFIG
+# ========================================
+CHUNKED_DIR = "data/uploads/chunked"
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+WRITE_BUFFER = 1024 * 1024   # request bytes collected before one (threaded) hash + write
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ChunkError(ValueError):
+    pass
+
+
+# ========================================
+# 🧩 session
+# ========================================
+def _session_dir(upload_id: str) -> str:
+    if not _UPLOAD_ID.match(upload_id or ""):
+        raise KeyError(upload_id)
+    return os.path.join(CHUNKED_DIR, upload_id)
+
+
+def _chunk_path(upload_id: str, index: int) -> str:
+    return os.path.join(_session_dir(upload_id), "chunks", f"{index:06d}.part")
+
+
+def load_session(upload_id: str) -> dict:
+    """session metadata, KeyError if the upload id is unknown"""
+    meta_path = os.path.join(_session_dir(upload_id), "meta.json")
+    if not os.path.exists(meta_path):
+        raise KeyError(upload_id)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_session(session: dict):
+    meta_path = os.path.join(_session_dir(session["upload_id"]), "meta.json")
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(session, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _find_session(file_name: str, total_size: int, sha256: str):
+    """an unfinished upload of the same file, so init can resume it"""
+    if not sha256 or not os.path.isdir(CHUNKED_DIR):
+        return None
+    for upload_id in os.listdir(CHUNKED_DIR):
+        try:
+            session = load_session(upload_id)
+        except KeyError:
+            continue
+        if (session["file_name"], session["total_size"], session["sha256"]) == (file_name, total_size, sha256):
+            return session
+    return None
+
+
+def init_upload(file_name: str, total_size: int, chunk_size: int = None, sha256: str = None) -> dict:
+    """start (or resume) a chunked upload, return the session with received chunks"""
+    file_name = os.path.basename(file_name)
+    if not file_name.lower().endswith(".zip"):
+        raise ChunkError("Only .zip chat exports can be uploaded")
+    if total_size <= 0:
+        raise ChunkError("total_size must be positive")
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ChunkError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+    sha256 = sha256.lower() if sha256 else None
+
+    session = _find_session(file_name, total_size, sha256)
+    if session is None:
+        session = {
+            "upload_id": uuid.uuid4().hex,
+            "file_name": file_name,
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "total_chunks": math.ceil(total_size / chunk_size),
+            "sha256": sha256,
+            "created_at": datetime.now().isoformat(),
+        }
+        os.makedirs(os.path.join(_session_dir(session["upload_id"]), "chunks"), exist_ok=True)
+        _save_session(session)
+    return upload_status(session["upload_id"])
+
+
+def received_chunks(upload_id: str) -> list:
+    chunk_dir = os.path.join(_session_dir(upload_id), "chunks")
+    return sorted(int(f.split(".")[0]) for f in os.listdir(chunk_dir) if f.endswith(".part"))
+
+
+def upload_status(upload_id: str) -> dict:
+    """session info + which chunks are already stored, next_index is where to resume"""
+    session = load_session(upload_id)
+    received = received_chunks(upload_id)
+    received_set = set(received)
+    missing = [i for i in range(session["total_chunks"]) if i not in received_set]
+    return {
+        **session,
+        "received": received,
+        "missing": missing,
+        "next_index": missing[0] if missing else None,
+        "complete": not missing,
+    }
+
+
+# ========================================
+# 🧾 chunks
+# ========================================
+def _expected_chunk_size(session: dict, index: int) -> int:
+    if index == session["total_chunks"] - 1:
+        return session["total_size"] - index * session["chunk_size"]
+    return session["chunk_size"]
+
+
+def _write_hashed(f, hasher, data):
+    hasher.update(data)
+    f.write(data)
+
+
+def _remove_if_exists(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def write_chunk(upload_id: str, index: int, stream, checksum: str) -> dict:
+    """
+    write one chunk from an async byte stream, only kept if its size and sha256 match.
+    re-sending a stored chunk simply replaces it.
+    only the stream is read on the event loop, file access / hashing run in the threadpool
+    (WRITE_BUFFER bytes at a time), so a large upload does not block other requests
+    """
+    session = await run_in_threadpool(load_session, upload_id)
+    if not 0 <= index < session["total_chunks"]:
+        raise ChunkError(f"chunk index must be between 0 and {session['total_chunks'] - 1}")
+    if not checksum:
+        raise ChunkError("missing chunk sha256 checksum")
+    expected_size = _expected_chunk_size(session, index)
+
+    path = _chunk_path(upload_id, index)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    hasher, size = hashlib.sha256(), 0
+    try:
+        f = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            buffer = bytearray()
+            async for data in stream:
+                size += len(data)
+                if size > expected_size:
+                    raise ChunkError(f"chunk {index} larger than {expected_size} bytes")
+                buffer += data
+                if len(buffer) >= WRITE_BUFFER:
+                    full, buffer = buffer, bytearray()
+                    await run_in_threadpool(_write_hashed, f, hasher, full)
+            if buffer:
+                await run_in_threadpool(_write_hashed, f, hasher, buffer)
+        finally:
+            await run_in_threadpool(f.close)
+        if size != expected_size:
+            raise ChunkError(f"chunk {index} has {size} bytes, expected {expected_size}")
+        if hasher.hexdigest() != checksum.lower():
+            raise ChunkError(f"chunk {index} checksum mismatch")
+    except Exception:
+        await run_in_threadpool(_remove_if_exists, tmp_path)
+        raise
+    await run_in_threadpool(os.replace, tmp_path, path)
+    return {"upload_id": upload_id, "index": index, "size": size}
+
+
+def assemble_upload(upload_id: str, output_dir: str, chunk_read_size: int = 1 << 20):
+    """
+    concatenate all chunks into the final archive (streamed, never fully in memory),
+    check the whole-file sha256 if given at init.
+    return (archive path, archive sha256), session files are removed
+    """
+    status = upload_status(upload_id)
+    if status["missing"]:
+        raise ChunkError(f"{len(status['missing'])} chunks missing, first missing index {status['next_index']}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = os.path.join(output_dir, f".{upload_id}.part")
+    hasher = hashlib.sha256()
+    with open(tmp_path, "wb") as out:
+        for index in range(status["total_chunks"]):
+            with open(_chunk_path(upload_id, index), "rb") as f:
+                for data in iter(lambda: f.read(chunk_read_size), b""):
+                    hasher.update(data)
+                    out.write(data)
+    archive_sha256 = hasher.hexdigest()
+    if status["sha256"] and archive_sha256 != status["sha256"]:
+        os.remove(tmp_path)
+        raise ChunkError("assembled file checksum mismatch")
+
+    # same layout as single-request uploads: one folder per content
+    archive_path = os.path.join(output_dir, archive_sha256[:16], status["file_name"])
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    os.replace(tmp_path, archive_path)
+    shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
+    return archive_path, archive_sha256
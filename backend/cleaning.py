@@ -2,12 +2,24 @@ import re
 import string
 import emoji 
 import pandas as pd
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize 
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import numpy as np
+from nltk.tokenize import NLTKWordTokenizer
 import os 
+import json, time, hashlib
+import duckdb
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
-STOPWORDS = set(stopwords.words("english"))
+from backend.stopwords_en import ENGLISH_STOPWORDS
+
+STOPWORDS = set(ENGLISH_STOPWORDS)
+# nltk word_tokenize without its punkt sentence split, which needs the downloaded punkt_tab data.
+# the split only matters for . ! ? brought back by slang replacement
+word_tokenize = NLTKWordTokenizer().tokenize
 emoji_pattern = re.compile(
     "["u"\U0001F600-\U0001F64F"  # emoticons
     u"\U0001F300-\U0001F5FF"     # symbols & pictographs
@@ -19,20 +31,77 @@ emoji_pattern = re.compile(
 def remove_emoji(text):
     return emoji_pattern.sub(r'',text)
 
-def replace_slang(text:str,slang_dict:dict) ->str:
-    """replace the slang to formal english"""
-    text_out = text
+# ===============================
+# 💬 slang matcher
+# ===============================
+def _trie_regex(words) -> str:
+    """
+    one regex for a list of words, built from their prefix trie,
+    e.g. [bb, bday, tmr] -> (?:b(?:b|day)|tmr).
+    matching cost depends on the word length, not on how many words there are
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # word may end here, longer matches are tried first
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+# (dict, its length, slang_version, (pattern, replacement function)) of the last compiled dictionary.
+# the dict stays referenced here, so its id can not be reused by another dict
+_slang_matcher = (None, None, None, None)
+
+def compile_slang(slang_dict: dict, version: str = None):
+    """
+    compile the whole slang dictionary into one regex + dict lookup,
+    only rebuilt when the dictionary content (slang_version) changes.
+    called again with the same dict object (per-row clean_text) nothing is hashed,
+    a dict edited in place with the same length must pass its new version.
+    return (pattern, repl) to use as pattern.sub(repl, text)
+    """
+    global _slang_matcher
+    cached_dict, cached_len, cached_version, matcher = _slang_matcher
+    if version is None:
+        if slang_dict is cached_dict and len(slang_dict) == cached_len:
+            return matcher
+        version = slang_version(slang_dict)
+    if version == cached_version:
+        _slang_matcher = (slang_dict, len(slang_dict), version, matcher)
+        return matcher
+
+    lookup = {}
     for slang, formal in slang_dict.items():
-        pattern = rf"\b{re.escape(slang)}\b"
-        text_out = re.sub(pattern,formal,text_out,flags=re.IGNORECASE)
-    return text_out
+        slang = str(slang).lower()
+        if slang:
+            # same slang twice (different case): first one wins, like the old sequential replace
+            lookup.setdefault(slang, str(formal))
+    if lookup:
+        pattern = re.compile(rf"\b(?:{_trie_regex(lookup)})\b", flags=re.IGNORECASE)
+    else:
+        pattern = re.compile(r"(?!)")  # matches nothing
+    repl = lambda m: lookup.get(m.group(0).lower(), m.group(0))
+    matcher = (pattern, repl)
+    _slang_matcher = (slang_dict, len(slang_dict), version, matcher)
+    return matcher
 
-    #tokens = word_tokenize(text)
-    #replaced = [slang_dict.get(token,token) for token in tokens]
-    #return ' '.join(replaced)
+def replace_slang(text:str,slang_dict:dict,matcher=None) ->str:
+    """replace the slang to formal english, single pass over the text (longest slang wins)"""
+    pattern, repl = matcher or compile_slang(slang_dict)
+    return pattern.sub(repl, text)
 
-def clean_text(text:str,slang_dict:dict =None) ->str:
-    if text is None:
+def clean_text(text:str,slang_dict:dict =None,slang_matcher=None) ->str:
+    #None / NaN (missing text in a pandas column)
+    if text is None or text != text:
         return ''
     if not isinstance(text,str):
         text=str(text)
@@ -55,21 +124,319 @@ def clean_text(text:str,slang_dict:dict =None) ->str:
     text=text.lower()
     #replace slang
     if slang_dict:
-        text = replace_slang(text,slang_dict)
+        text = replace_slang(text,slang_dict,slang_matcher)
     #remove stopwords
     tokens = word_tokenize(text)
     tokens = [t for t in tokens if t not in STOPWORDS]
     return ' '.join(tokens)
 
-def clean_dataframe(df:pd.DataFrame,slang_dict=None) ->pd.DataFrame:
+# ===============================
+# ⚡ batch cleaning (whole column at once)
+# ===============================
+# same steps as clean_text, but every step runs over the whole column:
+# pyarrow compute (RE2) where it gives exactly the python re result,
+# python re only where RE2 differs (unicode \b / \d, backreference) and only on the rows that need it.
+def _regex_class(chars) -> str:
+    return "".join(f"\\x{{{ord(c):x}}}" for c in chars)
+
+# python \s for str patterns == str.isspace (no whitespace above U+3000)
+_PY_SPACE = [chr(i) for i in range(0x3001) if chr(i).isspace()]
+WS_CLASS = f"[{_regex_class(_PY_SPACE)}]"
+URL_RE2 = f"(?:http|www)[^{_regex_class(_PY_SPACE)}]+"
+EMAIL_RE2 = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+EMOJI_RE2 = r"[\x{1F600}-\x{1F64F}\x{1F300}-\x{1F5FF}\x{1F680}-\x{1F6FF}\x{1F1E0}-\x{1F1FF}]"
+PUNCT_RE2 = r"[!-/:-@\[-`{-~]"  # string.punctuation
+WHATSAPP_MARKERS = ('<Media omitted>', 'This message was deleted', 'This message was edited')
+NUMBER_PATTERN = re.compile(r'\b\d+\b')
+REPEAT_PATTERN = re.compile(r'(.)\1{2,}')
+
+# word_tokenize on text without ascii punctuation only splits on whitespace,
+# pads unicode quotes / dashes and splits a few contractions (cannot, gonna, ...).
+# rows with anything else (e.g. punctuation brought back by slang replacement) go through word_tokenize
+TOKEN_PAD_RE2 = r"[«“‘„»”’\x{2012}-\x{2015}]"
+TOKENIZER_FALLBACK_RE2 = ("(?i)" + PUNCT_RE2 + "|[" + _regex_class(c for c in _PY_SPACE if c != " ") + "]"
+                          + "|cannot|gimme|gonna|gotta|lemme|wanna")
+STOPWORDS_ARRAY = pa.array(sorted(STOPWORDS | {""}))
+
+def _python_on_mask(arr: pa.Array, mask: pa.Array, func, source: pa.Array = None) -> pa.Array:
+    """replace the masked rows of arr with func(row of source), source defaults to arr itself"""
+    if not pc.any(mask).as_py():
+        return arr
+    source = arr if source is None else source
+    fixed = [func(t) for t in source.filter(mask).to_pylist()]
+    return pc.replace_with_mask(arr, mask, pa.array(fixed, pa.string()))
+
+def _remove_stopwords(arr: pa.Array) -> pa.Array:
+    """split on spaces, drop stopwords / empty tokens, join back, all in arrow"""
+    tokens = pc.split_pattern(arr, " ")
+    flat = pc.list_flatten(tokens)
+    keep = pc.invert(pc.is_in(flat, value_set=STOPWORDS_ARRAY))
+    parents = pc.list_parent_indices(tokens).to_numpy()
+    counts = np.bincount(parents[keep.to_numpy(zero_copy_only=False)], minlength=len(arr))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+    kept = pa.ListArray.from_arrays(pa.array(offsets), flat.filter(keep))
+    return pc.binary_join(kept, " ")
+
+def _tokenize_remove_stopwords(text: str) -> str:
+    return ' '.join(t for t in word_tokenize(text) if t not in STOPWORDS)
+
+def normalize_for_slang(values: list) -> list:
+    """the clean_text steps before slang replacement, i.e. the text the slang regex runs on"""
+    arr = pa.array(values, pa.string())
+
+    for literal in WHATSAPP_MARKERS:
+        arr = pc.replace_substring(arr, literal, '')
+    arr = pc.replace_substring(arr, '\n', ' ')
+    #remove website link, number, emoji
+    arr = pc.replace_substring_regex(arr, URL_RE2, '')
+    arr = pc.replace_substring_regex(arr, EMAIL_RE2, '')
+    arr = _python_on_mask(arr, pc.match_substring_regex(arr, r"\pN"), lambda t: NUMBER_PATTERN.sub('', t))
+    arr = pc.replace_substring_regex(arr, EMOJI_RE2, '')
+    #remove punctuation
+    arr = pc.replace_substring_regex(arr, PUNCT_RE2, '')
+    arr = pc.utf8_trim(pc.replace_substring_regex(arr, WS_CLASS + "+", ' '), ' ')
+
+    # python lower (full unicode case mapping) + repeated chars
+    return [REPEAT_PATTERN.sub(r'\1', t.lower()) for t in arr.to_pylist()]
+
+# ===============================
+# 🔎 slang prefilter (RE2 on the raw text)
+# ===============================
+# once the whatsapp markers are removed, a raw message can only contain a slang word after normalize_for_slang
+# if it matches slang_prefilter_re2: each char of the word (or anything python lower() turns into it) 1+ times
+# (repeated chars), with only what normalize_for_slang deletes in between (punctuation, emoji, numbers, emails),
+# urls and whitespace too between two words. looser than the slang regex, never stricter,
+# so the database can pick the messages and only those go through normalize_for_slang.
+_GAP_IN_WORD_RE2 = r"(?:[^\s\pL\pN]|\pN|[A-Za-z0-9._%+-]*@[A-Za-z0-9.-]*)*"
+_GAP_BETWEEN_WORDS_RE2 = r"(?:[^\pL\pN]|\pN|(?:http|www)\S*|[A-Za-z0-9._%+-]*@[A-Za-z0-9.-]*)*"
+# before the word: a non word char, the end of a removed email, or İ (lower() -> i + combining dot)
+_WORD_START_RE2 = r"(?:^|[^\pL\pN]|\.[A-Za-z]+|\x{130})"
+# after the word: a non word char or the start of a removed url / email
+_WORD_END_RE2 = r"(?:$|[^\pL\pN]|http|www|[A-Za-z0-9._%+-]*@)"
+
+_lower_sources = None
+
+def _char_re2(ch: str) -> str:
+    """RE2 class for every char that is ch after python lower(), e.g. k -> [kKK]"""
+    global _lower_sources
+    if _lower_sources is None:
+        sources = {}
+        for i in range(0x110000):
+            c = chr(i)
+            lowered = c.lower()
+            if lowered != c:
+                sources.setdefault(lowered[0], set()).add(c)
+        _lower_sources = sources
+    chars = {ch, ch.upper()[0]} | _lower_sources.get(ch, set())  # upper: final sigma depends on context
+    return f"[{_regex_class(sorted(chars))}]+"
+
+def slang_prefilter_re2(word: str) -> str:
+    """RE2 pattern, matches (at least) every raw text whose normalize_for_slang contains the slang word"""
+    is_word = lambda c: c.isalnum() or c == '_'
+    word = str(word).lower().strip()
+    parts = [_GAP_IN_WORD_RE2.join(_char_re2(ch) for ch in part) for part in word.split()]
+    # \b next to a non word char (e.g. an emoji slang) means the opposite, no boundary check then
+    return ((_WORD_START_RE2 if is_word(word[0]) else "") + _GAP_BETWEEN_WORDS_RE2.join(parts)
+            + (_WORD_END_RE2 if is_word(word[-1]) else ""))
+
+def slang_prefilter_sql(words, column: str = "text") -> str:
+    """
+    duckdb condition on a raw text column: markers removed first like clean_text,
+    then one slang_prefilter_re2 per word (one big alternation is much slower in RE2)
+    """
+    words = sorted({str(w).lower().strip() for w in words if w and str(w).strip()})
+    if not words:
+        return "false"
+    expr = column
+    for marker in WHATSAPP_MARKERS:
+        expr = f"replace({expr}, '{marker}', '')"
+    patterns = [slang_prefilter_re2(w).replace("'", "''") for w in words]
+    return "(" + " OR ".join(f"regexp_matches({expr}, '{p}')" for p in patterns) + ")"
+
+def slang_word_pattern(words) -> re.Pattern:
+    """the slang regex for just these words, run on normalize_for_slang output"""
+    words = {str(w).lower() for w in words if w and str(w).strip()}
+    if not words:
+        return re.compile(r"(?!)")
+    return re.compile(rf"\b(?:{_trie_regex(words)})\b", flags=re.IGNORECASE)
+
+def _clean_batch(values: list, slang_dict: dict = None) -> list:
+    """every clean_text step over a list of strings, column-wise"""
+    values = normalize_for_slang(values)
+    #replace slang
+    if slang_dict:
+        pattern, repl = compile_slang(slang_dict)
+        values = [pattern.sub(repl, t) for t in values]
+    arr = pa.array(values, pa.string())
+
+    #remove stopwords
+    fallback = pc.match_substring_regex(arr, TOKENIZER_FALLBACK_RE2)
+    simple = _remove_stopwords(pc.replace_substring_regex(arr, TOKEN_PAD_RE2, r" \0 "))
+    return _python_on_mask(simple, fallback, _tokenize_remove_stopwords, source=arr).to_pylist()
+
+# ===============================
+# 🧠 clean cache (duplicate texts)
+# ===============================
+# separate duckdb file, bulk cleaning workers must not lock the dashboard database
+CLEAN_CACHE_PATH = "data/clean_cache.duckdb"
+
+def clean_config_version(slang_dict: dict = None) -> str:
+    """cleaned text depends on the cleaning steps + slang dictionary only"""
+    return f"{CLEANER_VERSION}:{slang_version(slang_dict)}"
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def _open_clean_cache(retries: int = 100, wait: float = 0.05):
+    """connection to the cache file, None if another process keeps it locked"""
+    os.makedirs(os.path.dirname(CLEAN_CACHE_PATH), exist_ok=True)
+    for _ in range(retries):
+        try:
+            con = duckdb.connect(CLEAN_CACHE_PATH)
+        except duckdb.IOException:
+            time.sleep(wait)
+            continue
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS clean_cache (
+            config_version VARCHAR,
+            text_hash VARCHAR,
+            clean_text VARCHAR,
+            PRIMARY KEY (config_version, text_hash)
+        )
+        """)
+        return con
+    print("⚠️ clean cache locked, cleaning without it")
+    return None
+
+def lookup_clean_cache(con, hashes: list, config_version: str) -> dict:
+    """text hash -> cached clean text, for the hashes found"""
+    batch = pa.table({"text_hash": pa.array(hashes, pa.string())})
+    con.register("batch_hashes", batch)
+    try:
+        rows = con.execute("""
+            SELECT c.text_hash, c.clean_text
+            FROM clean_cache c JOIN batch_hashes b ON c.text_hash = b.text_hash
+            WHERE c.config_version = ?
+        """, [config_version]).fetchall()
+    finally:
+        con.unregister("batch_hashes")
+    return dict(rows)
+
+def save_clean_cache(con, hashes: list, cleaned: list, config_version: str):
+    if not hashes:
+        return
+    batch = pa.table({"text_hash": pa.array(hashes, pa.string()), "clean_text": pa.array(cleaned, pa.string())})
+    con.register("new_cache", batch)
+    try:
+        con.execute("""
+            INSERT INTO clean_cache
+            SELECT ?, text_hash, clean_text FROM new_cache
+            ON CONFLICT DO NOTHING
+        """, [config_version])
+    finally:
+        con.unregister("new_cache")
+
+def new_clean_stats() -> dict:
+    return {"rows": 0, "unique": 0, "cache_hits": 0, "cleaned": 0}
+
+def format_clean_stats(stats: dict) -> str:
+    rows, unique = stats["rows"], stats["unique"]
+    dedup = f"{rows} rows -> {unique} unique texts ({1 - unique / rows:.1%} duplicates)" if rows else "0 rows"
+    hits = f", cache hits {stats['cache_hits']}/{unique} ({stats['cache_hits'] / unique:.1%})" if unique else ""
+    return dedup + hits
+
+def clean_texts(texts, slang_dict: dict = None, cache: bool = False, stats: dict = None) -> list:
+    """
+    batch version of clean_text for a list / Series of texts,
+    returns the same strings clean_text would (see check_clean_equivalence).
+    every distinct text is cleaned once, with cache=True also looked up in / saved to
+    the persistent clean cache. stats (optional) counts rows / unique texts / cache hits
+    """
+    values = ['' if t is None or t != t else str(t) for t in texts]
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    uniques = list(uniques)
+    cleaned = [None] * len(uniques)
+    todo = list(range(len(uniques)))
+
+    # the cache file is only locked for the lookup and the save, never while cleaning,
+    # so parallel workers (clean_all_years) do not wait on each other
+    hashes = None
+    con = _open_clean_cache() if cache and uniques else None
+    if con is not None:
+        config_version = clean_config_version(slang_dict)
+        hashes = [text_hash(u) for u in uniques]
+        try:
+            found = lookup_clean_cache(con, hashes, config_version)
+        finally:
+            con.close()
+        todo = [i for i, h in enumerate(hashes) if h not in found]
+        for i, h in enumerate(hashes):
+            if h in found:
+                cleaned[i] = found[h]
+
+    result = _clean_batch([uniques[i] for i in todo], slang_dict) if todo else []
+    for i, text in zip(todo, result):
+        cleaned[i] = text
+    con = _open_clean_cache() if hashes is not None and todo else None
+    if con is not None:
+        try:
+            save_clean_cache(con, [hashes[i] for i in todo], result, config_version)
+        finally:
+            con.close()
+
+    if stats is not None:
+        stats["rows"] += len(values)
+        stats["unique"] += len(uniques)
+        stats["cache_hits"] += len(uniques) - len(todo)
+        stats["cleaned"] += len(todo)
+    return [cleaned[c] for c in codes]
+
+def check_clean_equivalence(texts, slang_dict: dict = None) -> list:
+    """
+    compare clean_texts with clean_text row by row,
+    return (text, clean_text result, clean_texts result) for every row that differs
+    """
+    texts = list(texts)
+    batch = clean_texts(texts, slang_dict)
+    matcher = compile_slang(slang_dict) if slang_dict else None
+    return [(t, expected, got) for t, got in zip(texts, batch)
+            if (expected := clean_text(t, slang_dict, matcher)) != got]
+
+# ===============================
+# 🔤 tokens
+# ===============================
+def singularize(token: str) -> str:
+    """rule based plural -> singular, e.g. diapers -> diaper, babies -> baby, boxes -> box"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+def tokenize_clean(clean: list):
+    """
+    clean_text is already space separated tokens,
+    return (tokens, tokens_singular) as arrow list<string> arrays
+    """
+    tokens = pc.split_pattern(pa.array(clean, pa.string()), " ")
+    # singular form computed once per distinct token
+    encoded = pc.list_flatten(tokens).dictionary_encode()
+    singular = pa.array([singularize(t) for t in encoded.dictionary.to_pylist()], pa.string())
+    tokens_singular = pa.ListArray.from_arrays(tokens.offsets, singular.take(encoded.indices))
+    return tokens, tokens_singular
+
+def clean_dataframe(df:pd.DataFrame,slang_dict=None,cache:bool=False,stats:dict=None) ->pd.DataFrame:
     df=df.copy()
     df['datetime']=pd.to_datetime(df['datetime'],errors="coerce")
-    df['clean_text'] = (
-        df['text']
-        .fillna('')
-        .astype(str).apply(lambda x: clean_text(x,slang_dict)))
+    df['clean_text'] = clean_texts(df['text'].tolist(), slang_dict, cache=cache, stats=stats)
     #remove empty
     df=df[df['clean_text'].str.strip()!=""]
+    #token lists, so queries do not need to split clean_text again
+    tokens, tokens_singular = tokenize_clean(df['clean_text'].tolist())
+    df['tokens'] = pd.arrays.ArrowExtensionArray(tokens)
+    df['tokens_singular'] = pd.arrays.ArrowExtensionArray(tokens_singular)
     
     #add datetime feature
     df['year']=df['datetime'].dt.year
@@ -77,45 +444,237 @@ def clean_dataframe(df:pd.DataFrame,slang_dict=None) ->pd.DataFrame:
     df['month']=df['datetime'].dt.month
 
     return df
+
+CLEAN_SCHEMA = pa.schema([
+    ("datetime", pa.timestamp("us")),
+    ("user", pa.string()),
+    ("group_id", pa.string()),
+    ("text", pa.string()),
+    ("group_name", pa.string()),
+    ("clean_text", pa.string()),
+    ("year", pa.int32()),
+    ("quarter", pa.int32()),
+    ("month", pa.int32()),
+    ("tokens", pa.list_(pa.string())),
+    ("tokens_singular", pa.list_(pa.string())),
+    ("msg_seq", pa.int64()),
+])
+
+def clean_parquet_file(input_path:str, output_path:str, slang_dict=None, cache:bool=False,
+                       stats:dict=None) -> int:
+    """
+    clean a structured parquet file row group by row group,
+    each cleaned batch is appended to output as its own row group.
+    duplicate texts are cleaned once (see clean_texts), the hit rate is logged per file.
+    return number of rows written
+    """
+    file_stats = new_clean_stats()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    total = 0
+    source = pq.ParquetFile(input_path)
+    offset = 0
+    try:
+        with pq.ParquetWriter(tmp_path, CLEAN_SCHEMA) as writer:
+            for i in range(source.num_row_groups):
+                df = source.read_row_group(i).to_pandas()
+                # structure files written before msg_seq existed: position in the file is the sequence
+                position = pd.Series(np.arange(offset + 1, offset + len(df) + 1), index=df.index)
+                df['msg_seq'] = df['msg_seq'].fillna(position) if 'msg_seq' in df else position
+                offset += len(df)
+                df_cleaned = clean_dataframe(df, slang_dict, cache=cache, stats=file_stats)
+                if df_cleaned.empty:
+                    continue
+                table = pa.Table.from_pandas(df_cleaned[CLEAN_SCHEMA.names], schema=CLEAN_SCHEMA,
+                                             preserve_index=False, safe=False)
+                writer.write_table(table)
+                total += len(df_cleaned)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    print(f"{os.path.basename(input_path)}: {format_clean_stats(file_stats)}")
+    if stats is not None:
+        for k, v in file_stats.items():
+            stats[k] += v
+    return total
+
+# ===============================
+# 🗂️ clean manifest (skip files already clean)
+# ===============================
+# bump when the cleaning steps change, every file is cleaned again
+# 5: vendored stopword list, no sentence split before tokenizing
+CLEANER_VERSION = "5"
+CLEAN_MANIFEST_PATH = "data/processing_output/clean_manifest.json"
+
+def slang_version(slang_dict: dict = None) -> str:
+    """short hash of the slang dictionary content"""
+    items = sorted((str(k), str(v)) for k, v in (slang_dict or {}).items())
+    return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()[:16]
+
+def file_fingerprint(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def load_clean_manifest(path: str = CLEAN_MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_clean_manifest(manifest: dict, path: str = CLEAN_MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_clean_current(entry: dict, input_path: str, output_path: str, slang_ver: str) -> bool:
+    """output exists and was made from this exact input with the same slang / cleaner version"""
+    if not entry or not os.path.exists(output_path):
+        return False
+    return (entry.get("input_fingerprint") == file_fingerprint(input_path)
+            and entry.get("slang_version") == slang_ver
+            and entry.get("cleaner_version") == CLEANER_VERSION)
+
+def _clean_file_task(input_path: str, output_path: str, slang_dict, cache: bool = False) -> dict:
+    """worker entry, never raise so one bad file does not stop the pool"""
+    start = time.perf_counter()
+    try:
+        fingerprint = file_fingerprint(input_path)
+        stats = new_clean_stats()
+        rows = clean_parquet_file(input_path, output_path, slang_dict, cache=cache, stats=stats)
+        return {"ok": True, "input": input_path, "output": output_path, "rows": rows, "clean_stats": stats,
+                "input_fingerprint": fingerprint, "seconds": round(time.perf_counter() - start, 3),
+                "worker_pid": os.getpid()}
+    except Exception as e:
+        return {"ok": False, "input": input_path, "output": output_path,
+                "error": f"{type(e).__name__}: {e}", "worker_pid": os.getpid()}
+
 def clean_all_years(input_base="data/processing_output/structure_chat",
                     output_base="data/processing_output/clean_chat_df",
-                    slang_dict=None):
+                    slang_dict=None, workers: int = None, force: bool = False,
+                    manifest_path: str = CLEAN_MANIFEST_PATH, cache: bool = False) -> dict:
     """
-    read every file and clean it
+    clean every structure_chat file of every year on a process pool.
+    files whose input and slang dictionary did not change since the last run are skipped
+    (see the manifest), force=True cleans everything again.
+    cache=True uses the persistent clean cache for texts seen in earlier runs.
+    return a report with rows/s per worker and the duplicate / cache hit stats
     """
     if not os.path.exists(input_base):
         print(f"⚠️ Input base path not found: {input_base}")
-        return
-
+        return None
 
-    for year_folder in os.listdir(input_base):
+    slang_ver = slang_version(slang_dict)
+    manifest = load_clean_manifest(manifest_path)
+    todo, skipped = [], 0
+    for year_folder in sorted(os.listdir(input_base)):
         year_path = os.path.join(input_base, year_folder)
         if not os.path.isdir(year_path):
             continue
-
-        output_folder = os.path.join(output_base, year_folder)
-        os.makedirs(output_folder, exist_ok=True)
-
-        print(f"Cleaning group year: {year_folder}")
-        for file in tqdm(os.listdir(year_path), desc=f"Cleaning {year_folder}"):
-            
+        for file in sorted(os.listdir(year_path)):
+            if not file.endswith(".parquet"):
+                continue
             input_path = os.path.join(year_path, file)
-            output_path = os.path.join(output_folder, file)
+            output_path = os.path.join(output_base, year_folder, file)
+            if not force and is_clean_current(manifest.get(output_path), input_path, output_path, slang_ver):
+                skipped += 1
+                continue
+            todo.append((input_path, output_path))
+    print(f"Cleaning {len(todo)} files, {skipped} already clean (slang version {slang_ver})")
 
+    start = time.perf_counter()
+    results, errors = [], []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    try:
+        if workers == 1:
+            done = (_clean_file_task(i, o, slang_dict, cache) for i, o in todo)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            futures = [executor.submit(_clean_file_task, i, o, slang_dict, cache) for i, o in todo]
+            done = (f.result() for f in as_completed(futures))
+        for res in tqdm(done, total=len(todo), desc="Cleaning"):
+            if not res["ok"]:
+                errors.append(res)
+                print(f"❌ Error cleaning {res['input']}: {res['error']}")
+                continue
+            results.append(res)
+            manifest[res["output"]] = {
+                "input": res["input"],
+                "input_fingerprint": res["input_fingerprint"],
+                "slang_version": slang_ver,
+                "cleaner_version": CLEANER_VERSION,
+                "rows": res["rows"],
+                "cleaned_at": datetime.now().isoformat(timespec="seconds"),
+            }
+    finally:
+        if workers > 1:
+            executor.shutdown()
+        save_clean_manifest(manifest, manifest_path)
 
-            try:
-                df = pd.read_parquet(input_path)
-                df_cleaned = clean_dataframe(df, slang_dict)
+    per_worker = {}
+    for res in results:
+        w = per_worker.setdefault(res["worker_pid"], {"files": 0, "rows": 0, "seconds": 0.0})
+        w["files"] += 1
+        w["rows"] += res["rows"]
+        w["seconds"] += res["seconds"]
+    for w in per_worker.values():
+        w["seconds"] = round(w["seconds"], 3)
+        w["rows_per_sec"] = round(w["rows"] / w["seconds"], 1) if w["seconds"] > 0 else None
 
-                df_cleaned.to_parquet(output_path, index=False)
-                print(f"✅ Cleaned & saved: {output_path} ({len(df_cleaned)} rows)")
+    clean_stats = new_clean_stats()
+    for res in results:
+        for k, v in res["clean_stats"].items():
+            clean_stats[k] += v
 
-
-            except Exception as e:
-                print(f"❌ Error cleaning {file}: {e}")
+    elapsed = time.perf_counter() - start
+    rows = sum(r["rows"] for r in results)
+    report = {
+        "workers": workers,
+        "cleaned": len(results),
+        "skipped": skipped,
+        "failed": len(errors),
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "per_worker": per_worker,
+        "clean_stats": clean_stats,
+        "errors": errors,
+    }
+    for pid, w in per_worker.items():
+        print(f"  worker {pid}: {w['files']} files, {w['rows']} rows, {w['rows_per_sec']} rows/s")
+    print(f"✅ Cleaned {len(results)} files ({rows} rows) in {report['seconds']}s, "
+          f"{skipped} skipped, {len(errors)} failed")
+    print(f"  {format_clean_stats(clean_stats)}")
+    return report
 
 
 if __name__=="__main__":
-    df_slang=pd.read_csv("data/other_data/slang_to_formal.csv")
-    slang_dict = dict(zip(df_slang['slang'].str.lower(),df_slang['formal'].str.lower()))
-    clean_all_years(slang_dict=slang_dict)
\ No newline at end of file
+    # python -m backend.cleaning --workers 8   -> clean every year, unchanged files are skipped
+    # python -m backend.cleaning --check       -> compare batch cleaning with clean_text on structure_chat
+    import argparse, glob
+    parser = argparse.ArgumentParser(description="clean structure_chat parquet files")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size, default cpu count")
+    parser.add_argument("--force", action="store_true", help="clean every file even if unchanged")
+    parser.add_argument("--cache", action="store_true", help="reuse clean texts from earlier runs (data/clean_cache.duckdb)")
+    parser.add_argument("--check", action="store_true", help="only compare clean_texts with clean_text")
+    args = parser.parse_args()
+
+    from backend.data_loader import load_slang_dict_offline
+    # admin slang table (read-only), the csv it was seeded from if the api server has the database open
+    slang_dict = load_slang_dict_offline()
+    if args.check:
+        files = glob.glob("data/processing_output/structure_chat/*/*.parquet")
+        texts = pd.concat([pd.read_parquet(f, columns=["text"]) for f in files])["text"].tolist() if files else []
+        mismatches = check_clean_equivalence(texts, slang_dict)
+        for text, expected, got in mismatches[:20]:
+            print(f"{text!r}\n  clean_text : {expected!r}\n  clean_texts: {got!r}")
+        print(f"{len(mismatches)} of {len(texts)} texts differ")
+    else:
+        clean_all_years(slang_dict=slang_dict, workers=args.workers, force=args.force, cache=args.cache)
+        from backend.chat_partition import hive_enabled, migrate_to_hive
+        if hive_enabled():
+            # msg_year=/msg_month= copy of the groups cleaned again
+            migrate_to_hive()
\ No newline at end of file
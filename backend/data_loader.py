@@ -1,56 +1,225 @@
 import pandas as pd
-import duckdb, threading
+import pyarrow as pa
+import duckdb
+import os, glob, time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
 from typing import Union, List
 from functools import lru_cache
+from backend.db_pool import read_cursor, write_connection, DB_PATH
+from backend.group_stage import create_stage_views
+from backend.chat_partition import hive_enabled, migrate_to_hive, create_hive_view
 
-#DB_PATH= ":memory:"
-DB_PATH = "data/chat_cache.duckdb"
+# connections come from backend.db_pool:
+#   with read_cursor() as con:       queries (pooled cursors)
+#   with write_connection() as con:  inserts / DDL (single writer)
 
-# Thread-local storage: ensures each thread has its own connection object
-_thread_local = threading.local()
+CLEAN_PARQUET_GLOB = "data/processing_output/clean_chat_df/*/*.parquet"
 
-def get_read_connection():
+# === chat table ===
+# chat is a native duckdb table sorted by group_id, datetime (min/max zone maps prune group and time filters),
+# chat_sources remembers the fingerprint of every parquet file loaded into it
+# cleaning.singularize over a token list, for files cleaned before tokens_singular existed
+SINGULARIZE_SQL = """list_transform({tokens}, t -> CASE
+            WHEN length(t) > 4 AND suffix(t, 'ies') THEN left(t, -3) || 'y'
+            WHEN suffix(t, 'sses') OR suffix(t, 'shes') OR suffix(t, 'ches') OR suffix(t, 'xes') OR suffix(t, 'zes')
+                THEN left(t, -2)
+            WHEN length(t) > 3 AND suffix(t, 's') AND NOT (suffix(t, 'ss') OR suffix(t, 'us') OR suffix(t, 'is'))
+                THEN left(t, -1)
+            ELSE t END)"""
+
+def _chat_select(con, files) -> str:
+    """
+    typed SELECT over the given clean parquet files.
+    union_by_name: files cleaned before the token columns existed still load,
+    their tokens come from splitting clean_text
     """
-    Return a thread-local, read-only DuckDB connection.
-    Each FastAPI/Streamlit worker thread will have its own connection
+    source = f"read_parquet({files!r}, union_by_name=true)"
+    columns = set(con.execute(f"DESCRIBE SELECT * FROM {source}").fetchdf()["column_name"])
+    split = "string_split(clean_text, ' ')"
+    tokens = f"coalesce(tokens, {split})" if "tokens" in columns else split
+    # singular forms (diapers -> diaper) for plural-insensitive unnest / grouping queries
+    singular = SINGULARIZE_SQL.format(tokens=tokens)
+    tokens_singular = f"coalesce(tokens_singular, {singular})" if "tokens_singular" in columns else singular
+    # msg_seq comes from ingestion, numbered once here for files cleaned before it existed
+    msg_seq = "row_number() OVER (PARTITION BY group_id ORDER BY datetime)"
+    if "msg_seq" in columns:
+        msg_seq = f"coalesce(msg_seq, {msg_seq})"
+    exclude = [c for c in ("datetime", "year", "month", "quarter", "group_id", "tokens", "tokens_singular", "msg_seq")
+               if c in columns]
+    return f"""
+        SELECT 
+            CAST(datetime AS TIMESTAMP) AS datetime,
+            * EXCLUDE ({', '.join(exclude)}),
+            CAST(year AS INTEGER) AS year, 
+            CAST(month AS INTEGER) AS month,
+            CAST(quarter AS INTEGER) AS quarter,
+            CAST(group_id AS VARCHAR) AS group_id,
+            {tokens} AS tokens,
+            {tokens_singular} AS tokens_singular,
+            CAST({msg_seq} AS BIGINT) AS msg_seq
+        FROM {source}
+        ORDER BY group_id, datetime, msg_seq
     """
-    if not hasattr(_thread_local, "con"):
-        _thread_local.con = duckdb.connect(DB_PATH)
-    return _thread_local.con
 
+def _clean_file_fingerprints() -> dict:
+    """{parquet path: (size, mtime_ns)} of every clean file on disk"""
+    fingerprints = {}
+    for path in glob.glob(CLEAN_PARQUET_GLOB):
+        st = os.stat(path)
+        fingerprints[os.path.normpath(path)] = (st.st_size, st.st_mtime_ns)
+    return fingerprints
+
+def _file_group_id(path: str) -> str:
+    # {year}/group_{group_id}.parquet
+    return os.path.basename(path)[len("group_"):-len(".parquet")]
+
+def _save_chat_sources(con, fingerprints: dict):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS chat_sources (
+            file VARCHAR PRIMARY KEY,
+            group_id VARCHAR,
+            size BIGINT,
+            mtime_ns BIGINT
+        )""")
+    con.execute("DELETE FROM chat_sources WHERE file IN (SELECT unnest(?::VARCHAR[]))", [list(fingerprints)])
+    rows = [(f, _file_group_id(f), size, mtime) for f, (size, mtime) in fingerprints.items() if size is not None]
+    if rows:
+        con.executemany("INSERT INTO chat_sources VALUES (?, ?, ?, ?)", rows)
+
+def sync_chat_table(con, full: bool = False) -> dict:
+    """
+    bring the chat table in line with the clean parquet files.
+    only the groups whose files were added / changed / removed since the last sync are reloaded
+    (delete + sorted insert in one transaction), full=True or a missing table rebuilds everything
+    """
+    start = time.perf_counter()
+    fingerprints = _clean_file_fingerprints()
+    is_table = con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'chat' AND schema_name = 'main'").fetchone()[0]
+    known = {}
+    if is_table and not full:
+        try:
+            known = {f: (size, mtime) for f, size, mtime in
+                     con.execute("SELECT file, size, mtime_ns FROM chat_sources").fetchall()}
+        except duckdb.CatalogException:
+            full = True
+    full = full or not is_table
+
+    con.execute("BEGIN TRANSACTION")
+    try:
+        if full:
+            if con.execute("SELECT COUNT(*) FROM duckdb_views() WHERE view_name = 'chat'").fetchone()[0]:
+                # chat used to be a read_parquet view
+                con.execute("DROP VIEW chat")
+            con.execute("DROP TABLE IF EXISTS chat_sources")
+            if fingerprints:
+                con.execute(f"CREATE OR REPLACE TABLE chat AS {_chat_select(con, sorted(fingerprints))}")
+            groups = {_file_group_id(f) for f in fingerprints}
+            _save_chat_sources(con, fingerprints)
+        else:
+            changed = {f for f, fp in fingerprints.items() if known.get(f) != fp}
+            removed = set(known) - set(fingerprints)
+            groups = {_file_group_id(f) for f in changed | removed}
+            if groups:
+                con.execute("DELETE FROM chat WHERE group_id IN (SELECT unnest(?::VARCHAR[]))", [sorted(groups)])
+                files = sorted(f for f in fingerprints if _file_group_id(f) in groups)
+                if files:
+                    con.execute(f"INSERT INTO chat BY NAME {_chat_select(con, files)}")
+                _save_chat_sources(con, {f: fingerprints.get(f, (None, None)) for f in changed | removed})
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    report = {"full": full, "groups": len(groups), "files": len(fingerprints),
+              "seconds": round(time.perf_counter() - start, 3)}
+    if groups:
+        print(f"🔵 chat table {'rebuilt' if full else 'updated'}: {len(groups)} groups in {report['seconds']}s")
+    return report
+
+# === group index ===
+# built once per chat table version and never mutated, refresh builds a new one and swaps the reference
+@dataclass(frozen=True)
+class GroupIndex:
+    version: int
+    group_ids: tuple
+    by_year: MappingProxyType          # year -> sorted tuple of group_ids
+    available_years: tuple             # newest first
+    default_groups: tuple              # latest 12 group_ids
+
+
+def build_group_index(group_ids, version: int = 0) -> GroupIndex:
+    group_ids = tuple(sorted({str(g) for g in group_ids}))
+    by_year = {}
+    for gid in group_ids:
+        # group_id starts with the year of the group
+        if gid[:4].isdigit():
+            by_year.setdefault(int(gid[:4]), []).append(gid)
+    return GroupIndex(
+        version=version,
+        group_ids=group_ids,
+        by_year=MappingProxyType({year: tuple(ids) for year, ids in by_year.items()}),
+        available_years=tuple(sorted(by_year, reverse=True)),
+        default_groups=group_ids[-12:],
+    )
+
+
+_group_index = None
+
+
+def _swap_group_index(con) -> GroupIndex:
+    """new index from the chat table, published with one reference assignment (caller holds the writer)"""
+    global _group_index
+    rows = con.execute("SELECT DISTINCT group_id FROM chat").fetchall()
+    version = _group_index.version + 1 if _group_index else 1
+    _group_index = build_group_index([g for (g,) in rows], version)
+    return _group_index
 
-def get_write_connection():
+
+def get_group_index() -> GroupIndex:
+    index = _group_index
+    if index is None:
+        load_chat_data()
+        index = _group_index
+    return index
+
+
+def _sync_chat(con, full: bool = False):
     """
-    a temporary connection,
-    The connection should be closed immediately after writing.
+    chat table from the clean files, with CHAT_LAYOUT=hive a view over the msg_year=/msg_month= partitions
+    (written by ingestion / re-clean, the view reads them at query time)
     """
-    return duckdb.connect(DB_PATH)
+    if not hive_enabled():
+        sync_chat_table(con, full=full)
+        return
+    if con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'chat' AND schema_name = 'main'").fetchone()[0]:
+        # switched from the table layout (switching back rebuilds the table)
+        con.execute("DROP TABLE chat")
+        con.execute("DROP TABLE IF EXISTS chat_sources")
+    create_hive_view(con, "chat")
 
 @lru_cache(maxsize=1)
 def load_chat_data():
     print("load data using duckdb...")
-    con = get_read_connection()
-
-    con.execute(""" 
-        CREATE OR REPLACE VIEW chat AS
-        SELECT 
-            *,
-            CAST(year AS INTEGER) AS year, 
-            CAST(month AS INTEGER) AS month,
-            CAST(quarter AS INTEGER) AS quarter,
-            CAST(group_id AS VARCHAR) AS group_id
-        FROM read_parquet('data/processing_output/clean_chat_df/*/*.parquet');
-    """)
+    if hive_enabled():
+        # partitions of groups cleaned while the layout was off / before it existed
+        migrate_to_hive()
+    with write_connection() as con:
+        _sync_chat(con)
+        create_stage_views(con)
+        index = _swap_group_index(con)
 
     # extract all group_id for default setting
-    df = con.execute("SELECT DISTINCT group_id FROM chat ORDER BY group_id;").fetchdf()
-    group_ids = sorted(df['group_id'].unique().tolist())
+    df = pd.DataFrame({"group_id": list(index.group_ids)})
 
     # latest 12 group as default（order by group_id）
-    default_groups = group_ids[-12:]
+    default_groups = list(index.default_groups)
 
 
-    print(f"🔵 Loaded {len(group_ids)} groups")
+    print(f"🔵 Loaded {len(index.group_ids)} groups")
     print(f"🔵 Default groups: {default_groups}")
 
 
@@ -59,117 +228,373 @@ def load_chat_data():
 
 def load_default_groups():
     """external API get default group_id list"""
-    _, default_groups = load_chat_data()
-    return default_groups
+    return list(get_group_index().default_groups)
 
 
 def load_groups_by_year(group_year: Union[int,List[int]]) -> list:
     """
     Return all group_ids where the group_id starts with the given year.
     """
-    df,_ =load_chat_data()
-
-    df['group_year'] = df['group_id'].astype(str).str[:4].astype(int)
+    by_year = get_group_index().by_year
     if isinstance(group_year,int):
-        years = [group_year]
-    else:
-        years = group_year
-    result = sorted(df[df["group_year"].isin(years)]["group_id"].unique().tolist())
-    return result
+        return list(by_year.get(group_year, ()))
+    return sorted(gid for year in set(group_year) for gid in by_year.get(year, ()))
 
 
 def load_available_years() -> list:
     """
     Return all distinct years extracted from group_id (first 4 characters).
     """
-    df, _ = load_chat_data()
-    group_years = sorted(
-        df['group_id'].astype(str).str[:4].astype(int).unique().tolist(),
-        reverse=True
-    )
-    return group_years
+    return list(get_group_index().available_years)
 
 
-def query_chat(sql: str, params=None):
+def query_chat(sql: str, params=None, frames: dict = None):
     """
     general DuckDB query
     all API just need pass SQL
+    frames: {name: DataFrame} registered on this request's pooled cursor only (e.g. df_temp)
     """
-    con = get_read_connection()
-    return con.execute(sql, params).fetchdf()
+    with read_cursor() as con:
+        for name, df in (frames or {}).items():
+            con.register(name, df)
+        try:
+            return con.execute(sql, params).fetchdf()
+        finally:
+            for name in (frames or {}):
+                con.unregister(name)
 
-def refresh_duckdb_cache():
-    """clear in-memory cache"""
+def refresh_duckdb_cache(full: bool = False):
+    """reload changed clean files into the chat table (or view) + clear in-memory cache"""
+    with write_connection() as con:
+        _sync_chat(con, full=full)
+        # requests keep using the old index until the new one is complete
+        _swap_group_index(con)
     load_chat_data.cache_clear()
-    con = get_write_connection()
-    con.execute(""" 
-        CREATE OR REPLACE VIEW chat AS
-        SELECT 
-            *,
-            CAST(year AS INTEGER) AS year, 
-            CAST(month AS INTEGER) AS month,
-            CAST(quarter AS INTEGER) AS quarter,
-            CAST(group_id AS VARCHAR) AS group_id
-        FROM read_parquet('data/processing_output/clean_chat_df/*/*.parquet');
-    """)
-    con.close()
     print("clear cache, will reload next call")
 
+# === slang dictionary ===
+def load_slang_dict(con=None) -> dict:
+    """
+    slang -> formal from the admin slang_dictionary table, empty dict if it does not exist yet.
+    con: read on this connection (e.g. the writer inside a slang edit) instead of a pooled cursor
+    """
+    sql = "SELECT slang, formal FROM slang_dictionary ORDER BY id"
+    try:
+        if con is not None:
+            return dict(con.execute(sql).fetchall())
+        with read_cursor() as cursor:
+            return dict(cursor.execute(sql).fetchall())
+    except duckdb.CatalogException:
+        return {}
+
+SLANG_CSV_PATH = "data/other_data/slang_to_formal.csv"
+
+def load_slang_dict_offline() -> dict:
+    """
+    slang dictionary for the offline CLIs (cleaning / bulk ingestion), never through the server's pool:
+    the admin table through a short-lived read_only connection, the seed csv if the api server holds
+    the database (duckdb allows no other process next to a read-write one) or the table is not there yet
+    """
+    try:
+        con = duckdb.connect(DB_PATH, read_only=True)
+        try:
+            slang_dict = dict(con.execute("SELECT slang, formal FROM slang_dictionary ORDER BY id").fetchall())
+        finally:
+            con.close()
+        if slang_dict:
+            return slang_dict
+    except duckdb.IOException as e:
+        print(f"⚠️ cannot open {DB_PATH} read-only ({e}), is the api server running? "
+              f"slang from {SLANG_CSV_PATH}, admin slang edits are not applied")
+    except duckdb.CatalogException:
+        pass
+    df_slang = pd.read_csv(SLANG_CSV_PATH)
+    return dict(zip(df_slang['slang'].str.lower(), df_slang['formal'].str.lower()))
+
 # === sentiment cache layer ===
+# keyed by (text_hash, model_version): a fixed-width hash of the normalised text, so lookups hit the
+# primary key index instead of comparing full texts. rule_hash is the sentiment_rule.json the label
+# was made with, model_sentiment the raw model label before the regex rules
 from datetime import datetime
+import hashlib
+import json
+import unicodedata
+
+REGEX_RULE = "regex overwrite"
+
+
+def normalise_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> int:
+    """64-bit hash of the normalised text (UBIGINT)"""
+    return int.from_bytes(hashlib.blake2b(normalise_text(text).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def sentiment_model_version(model_dir: str) -> str:
+    """model folder name + hash of its config and file sizes, changes when the model is swapped"""
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(model_dir, "**", "*"), recursive=True)):
+        if not os.path.isfile(path):
+            continue
+        digest.update(f"{os.path.relpath(path, model_dir)}:{os.path.getsize(path)}".encode())
+        if os.path.basename(path) == "config.json":
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return f"{os.path.basename(os.path.normpath(model_dir))}:{digest.hexdigest()[:12]}"
+
+
+def sentiment_rule_hash(rules) -> str:
+    """hash of the loaded sentiment_rule.json rules"""
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
 
 def init_sentiment_cache(con):
-    """initialize cache table(just execute once)"""
+    """initialize cache table(just execute once), the old text keyed table is kept as sentiment_cache_legacy"""
+    columns = {c for (c,) in con.execute(
+        "SELECT column_name FROM duckdb_columns() WHERE table_name = 'sentiment_cache'").fetchall()}
+    if columns and "text_hash" not in columns:
+        con.execute("ALTER TABLE sentiment_cache RENAME TO sentiment_cache_legacy")
+        print("🔵 old sentiment_cache renamed to sentiment_cache_legacy")
     con.execute("""
     CREATE TABLE IF NOT EXISTS sentiment_cache (
+        text_hash UBIGINT NOT NULL,
+        model_version VARCHAR NOT NULL,
+        rule_hash VARCHAR NOT NULL,
         text VARCHAR,
+        model_sentiment VARCHAR,
         sentiment VARCHAR,
         score DOUBLE,
         rule_applied VARCHAR,
-        updated_at TIMESTAMP
+        manual BOOLEAN DEFAULT false,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (text_hash, model_version)
     )
     """)
 
-def get_cached_sentiment(text: str):
+
+# in-process LRU in front of sentiment_cache, shared by every router of this process.
+# (text_hash, model_version) -> (rule_hash, manual, result), bounded by an estimate of its size in bytes
+SENTIMENT_LRU_BYTES = int(os.getenv("SENTIMENT_LRU_BYTES", str(32 * 1024 * 1024)))
+_ENTRY_OVERHEAD = 320   # tuple + dict + key objects, measured roughly with sys.getsizeof
+
+
+class SentimentLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        # bumped by invalidate, rows read from the table before that are not cached
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, rule_hash: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not (entry[0] == rule_hash or entry[1]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, key, rule_hash: str, manual: bool, result: dict, text: str, generation: int = None):
+        size = _ENTRY_OVERHEAD + len(text) + len(result.get("sentiment") or "") + len(result.get("rule_applied") or "")
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[3]
+            self._entries[key] = (rule_hash, manual, dict(result), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted[3]
+                self.evictions += 1
+
+    def invalidate(self, text_hash_: int):
+        """drop a text for every model version (manual label change)"""
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in self._entries if k[0] == text_hash_]:
+                self.bytes -= self._entries.pop(key)[3]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+sentiment_lru = SentimentLRU(SENTIMENT_LRU_BYTES)
+
+
+def sentiment_lru_stats() -> dict:
+    return sentiment_lru.stats()
+
+
+def _hash_table(texts) -> pa.Table:
+    texts = list(dict.fromkeys(t for t in texts if t is not None))
+    return pa.table({
+        "text_hash": pa.array([text_hash(t) for t in texts], pa.uint64()),
+        "text": pa.array(texts, pa.string()),
+    })
+
+
+def get_cached_sentiments(texts, model_version: str, rule_hash: str, relabel=None) -> dict:
+    """
+    {text: {"sentiment", "score", "rule_applied"}} for every text cached for this model version,
+    one join against the registered hash list instead of a query per text.
+    entries made with another rule file are only re-labelled when relabel(text, model_sentiment) is given
+    (no model inference), else they count as missing. manual labels are kept as they are
+    """
+    results, missing = {}, []
+    for text in dict.fromkeys(t for t in texts if t is not None):
+        cached = sentiment_lru.get((text_hash(text), model_version), rule_hash)
+        if cached is None:
+            missing.append(text)
+        else:
+            results[text] = cached
+    lookup = _hash_table(missing)
+    if not lookup.num_rows:
+        return results
+    generation = sentiment_lru.generation
+    try:
+        with read_cursor() as con:
+            con.register("sentiment_lookup", lookup)
+            try:
+                rows = con.execute("""
+                    SELECT l.text, c.model_sentiment, c.sentiment, c.score, c.rule_applied,
+                           c.rule_hash = ? OR c.manual AS current, c.manual
+                    FROM sentiment_lookup l
+                    JOIN sentiment_cache c ON c.text_hash = l.text_hash AND c.model_version = ?
+                """, [rule_hash, model_version]).fetchall()
+            finally:
+                con.unregister("sentiment_lookup")
+    except (duckdb.CatalogException, duckdb.BinderException):
+        # nothing saved yet / table not migrated yet
+        return results
+
+    relabelled = []
+    for text, model_sentiment, sentiment, score, rule, current, manual in rows:
+        if not current:
+            if relabel is None or model_sentiment is None:
+                continue
+            sentiment = relabel(text, model_sentiment)
+            rule = REGEX_RULE if sentiment != model_sentiment else None
+            relabelled.append((text, model_sentiment, sentiment, score, rule))
+        results[text] = {"sentiment": sentiment, "score": score, "rule_applied": rule}
+        if current:
+            sentiment_lru.put((text_hash(text), model_version), rule_hash, manual, results[text], text, generation)
+    if relabelled:
+        # only labels the new rules change are rewritten, the rest just move to the new rule_hash
+        save_sentiment_cache_many(relabelled, model_version, rule_hash)
+    return results
+
+
+def save_sentiment_cache_many(records, model_version: str, rule_hash: str):
+    """
+    upsert predictions in one transaction.
+    records: [(text, model_sentiment, sentiment, score, rule_applied)], manual labels are not overwritten
+    """
+    records = list({text_hash(r[0]): r for r in records if r[0] is not None}.values())
+    if not records:
+        return 0
+    texts, model_sentiments, sentiments, scores, rules = zip(*records)
+    batch = pa.table({
+        "text_hash": pa.array([text_hash(t) for t in texts], pa.uint64()),
+        "text": pa.array(texts, pa.string()),
+        "model_sentiment": pa.array(model_sentiments, pa.string()),
+        "sentiment": pa.array(sentiments, pa.string()),
+        "score": pa.array(scores, pa.float64()),
+        "rule_applied": pa.array(rules, pa.string()),
+    })
+    with write_connection() as con:
+        init_sentiment_cache(con)
+        con.register("sentiment_batch", batch)
+        generation = sentiment_lru.generation
+        try:
+            con.execute("BEGIN TRANSACTION")
+            con.execute("""
+                INSERT INTO sentiment_cache
+                    (text_hash, model_version, rule_hash, text, model_sentiment, sentiment, score,
+                     rule_applied, manual, updated_at)
+                SELECT text_hash, ?, ?, text, model_sentiment, sentiment, score, rule_applied, false, ?
+                FROM sentiment_batch
+                ON CONFLICT (text_hash, model_version) DO UPDATE SET
+                    rule_hash = excluded.rule_hash,
+                    model_sentiment = excluded.model_sentiment,
+                    sentiment = excluded.sentiment,
+                    score = excluded.score,
+                    rule_applied = excluded.rule_applied,
+                    updated_at = excluded.updated_at
+                WHERE NOT sentiment_cache.manual
+            """, [model_version, rule_hash, datetime.now()])
+            con.execute("COMMIT")
+            # manual rows were kept in the table, so they must not be cached with the new label
+            manual = {h for (h,) in con.execute("""
+                SELECT c.text_hash FROM sentiment_cache c JOIN sentiment_batch b ON c.text_hash = b.text_hash
+                WHERE c.model_version = ? AND c.manual
+            """, [model_version]).fetchall()}
+        finally:
+            con.unregister("sentiment_batch")
+    for text, _, sentiment, score, rule in records:
+        if text_hash(text) not in manual:
+            sentiment_lru.put((text_hash(text), model_version), rule_hash, False,
+                              {"sentiment": sentiment, "score": score, "rule_applied": rule}, text, generation)
+    return len(records)
+
+
+def get_cached_sentiment(text: str, model_version: str, rule_hash: str):
     """query from cached table"""
-    con = get_read_connection()
-    init_sentiment_cache(con)
-    result = con.execute(
-        "SELECT sentiment, score, rule_applied FROM sentiment_cache WHERE text = ?", 
-        [text]
-    ).fetchone()
-    if result:
-        return {"sentiment": result[0], "score": result[1], "rule_applied": result[2]}
-    return None
-
-
-def save_sentiment_cache(text: str, sentiment: str, score: float, rule_applied: str):
+    return get_cached_sentiments([text], model_version, rule_hash).get(text)
+
+
+def save_sentiment_cache(text: str, model_sentiment: str, sentiment: str, score: float, rule_applied: str,
+                         model_version: str, rule_hash: str):
     """save predicted sentiment to DuckDB"""
-    con = get_write_connection()
-    init_sentiment_cache(con)
-    con.execute("""
-        INSERT INTO sentiment_cache VALUES (?, ?, ?, ?, ?)
-    """, [text, sentiment, score, rule_applied, datetime.now()])
-    con.close()
+    save_sentiment_cache_many([(text, model_sentiment, sentiment, score, rule_applied)], model_version, rule_hash)
+
 
 def get_all_cached_sentiments(limit: int = 1000):
-    con = get_read_connection()
-    init_sentiment_cache(con)
-    return con.execute("SELECT * FROM sentiment_cache LIMIT ?", [limit]).fetch_df()
+    with write_connection() as con:
+        init_sentiment_cache(con)
+    with read_cursor() as con:
+        return con.execute("SELECT * FROM sentiment_cache LIMIT ?", [limit]).fetch_df()
 
 
 def update_sentiment_cache(text: str, new_sentiment: str, new_score: float = None, new_rule: str = None):
     """
-    update the setement label(human changes)
+    update the setement label(human changes), for every model version.
+    marked manual, so new predictions and rule changes keep it
     """
-    con = get_write_connection()
-    init_sentiment_cache(con)
-    con.execute("""
-        UPDATE sentiment_cache
-        SET sentiment = ?, 
-            score = COALESCE(?, score),
-            rule_applied = COALESCE(?, rule_applied),
-            updated_at = CURRENT_TIMESTAMP
-        WHERE text = ?
-    """, [new_sentiment, new_score, new_rule, text])
-    con.close()
+    with write_connection() as con:
+        init_sentiment_cache(con)
+        con.execute("""
+            UPDATE sentiment_cache
+            SET sentiment = ?, 
+                score = COALESCE(?, score),
+                rule_applied = COALESCE(?, rule_applied),
+                manual = true,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE text_hash = ?
+        """, [new_sentiment, new_score, new_rule, text_hash(text)])
+    # after the write, so a concurrent lookup cannot put the old label back from the table
+    sentiment_lru.invalidate(text_hash(text))
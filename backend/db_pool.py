@@ -0,0 +1,204 @@
+"""
+one duckdb database handle per process, shared by every router / loader / ingestion job of the api server.
+    read_cursor()       bounded pool of read-only cursors for analytics queries, waits while all are in use
+    write_connection()  the single writer cursor, one writer at a time (re-entrant in the same thread)
+cursors of the same handle share the catalog and buffer cache, so nothing is opened per request
+and there is only ever one lock holder on the database file.
+the handle keeps the file locked for the life of the process: offline tools (cleaning / ingestion CLI)
+must not use this module, they open their own short-lived read_only connection.
+"""
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+import duckdb
+
+# ========================================
+# ⚙️  CONFIG
+# ========================================
+DB_PATH = "data/chat_cache.duckdb"
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))   # seconds to wait for a cursor
+
+_db = None
+_db_lock = threading.Lock()
+_idle = queue.LifoQueue()
+_slots = threading.BoundedSemaphore(POOL_SIZE)
+_writer = None
+# held by write_connection, ingestion jobs also hold it around multi-step updates
+WRITE_LOCK = threading.RLock()
+
+_stats_lock = threading.Lock()
+_stats = {kind: {"acquired": 0, "timeouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+          for kind in ("read", "write")}
+_in_use = 0
+_created = 0
+_writer_depth = 0
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ReadOnlyError(Exception):
+    pass
+
+
+def _database():
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = duckdb.connect(DB_PATH)
+        return _db
+
+
+def _record(kind: str, waited: float = None):
+    with _stats_lock:
+        s = _stats[kind]
+        if waited is None:
+            s["timeouts"] += 1
+            return
+        ms = waited * 1000
+        s["acquired"] += 1
+        s["wait_ms_total"] += ms
+        s["wait_ms_max"] = max(s["wait_ms_max"], ms)
+
+
+# ========================================
+# 📖 readers
+# ========================================
+# duckdb's access_mode is set per database at connect time, not per cursor, and the readers share the
+# writer's read-write database. so read cursors check the statement type of every query instead
+READ_STATEMENTS = (duckdb.StatementType.SELECT, duckdb.StatementType.EXPLAIN)
+
+
+class ReadOnlyCursor:
+    """
+    pooled cursor that only runs read statements (SELECT / WITH / DESCRIBE / SHOW / EXPLAIN),
+    anything else raises ReadOnlyError before it reaches the database.
+    register / unregister / fetch* are passed through
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _check(self, sql: str):
+        for statement in self._cursor.extract_statements(sql):
+            if statement.type not in READ_STATEMENTS:
+                raise ReadOnlyError(f"read cursor cannot run {statement.type.name} statements, "
+                                    f"use write_connection()")
+
+    def execute(self, sql: str, params=None):
+        self._check(sql)
+        self._cursor.execute(sql, params)
+        return self
+
+    def sql(self, sql: str, *args, **kwargs):
+        self._check(sql)
+        return self._cursor.sql(sql, *args, **kwargs)
+
+    query = sql
+
+    def executemany(self, sql: str, params=None):
+        raise ReadOnlyError("read cursor cannot run executemany, use write_connection()")
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@contextmanager
+def read_cursor():
+    """
+    a pooled read-only cursor for queries, returned to the pool afterwards.
+    at most POOL_SIZE cursors are out at once, PoolTimeout after POOL_TIMEOUT seconds of waiting
+    """
+    global _in_use, _created
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=POOL_TIMEOUT):
+        _record("read")
+        raise PoolTimeout(f"no duckdb cursor free after {POOL_TIMEOUT}s ({POOL_SIZE} in use)")
+    _record("read", time.perf_counter() - start)
+    try:
+        cursor = _idle.get_nowait()
+    except queue.Empty:
+        cursor = _database().cursor()
+        with _stats_lock:
+            _created += 1
+    with _stats_lock:
+        _in_use += 1
+    failed = False
+    try:
+        yield ReadOnlyCursor(cursor)
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        with _stats_lock:
+            _in_use -= 1
+        if failed:
+            # may be left inside an aborted transaction, do not hand it out again
+            cursor.close()
+            with _stats_lock:
+                _created -= 1
+        else:
+            _idle.put(cursor)
+        _slots.release()
+
+
+# ========================================
+# ✍️ writer
+# ========================================
+@contextmanager
+def write_connection():
+    """
+    the single writer cursor. nested use in the same thread is allowed,
+    other threads wait (PoolTimeout after POOL_TIMEOUT seconds)
+    """
+    global _writer, _writer_depth
+    start = time.perf_counter()
+    if not WRITE_LOCK.acquire(timeout=POOL_TIMEOUT):
+        _record("write")
+        raise PoolTimeout(f"duckdb writer busy for more than {POOL_TIMEOUT}s")
+    _record("write", time.perf_counter() - start)
+    with _stats_lock:
+        _writer_depth += 1
+    try:
+        if _writer is None:
+            _writer = _database().cursor()
+        yield _writer
+    except BaseException:
+        try:
+            _writer.rollback()
+        except (duckdb.Error, AttributeError):
+            # nothing to roll back
+            pass
+        raise
+    finally:
+        with _stats_lock:
+            _writer_depth -= 1
+        WRITE_LOCK.release()
+
+
+# ========================================
+# 📊 stats
+# ========================================
+def pool_stats() -> dict:
+    """pool size / usage and how long callers waited for a cursor"""
+    with _stats_lock:
+        waits = {}
+        for kind, s in _stats.items():
+            waits[kind] = {
+                "acquired": s["acquired"],
+                "timeouts": s["timeouts"],
+                "wait_ms_avg": round(s["wait_ms_total"] / s["acquired"], 3) if s["acquired"] else 0.0,
+                "wait_ms_max": round(s["wait_ms_max"], 3),
+            }
+        return {
+            "pool_size": POOL_SIZE,
+            "read_cursors_open": _created,
+            "read_cursors_in_use": _in_use,
+            "writer_busy": _writer_depth > 0,
+            **waits,
+        }
@@ -1,11 +1,14 @@
 import re
 import os
+import glob
 import duckdb
 import pandas as pd
 from datetime import datetime
 import calendar
 from dateutil.relativedelta import relativedelta
 
+from backend.db_pool import write_connection
+
 
 # -------- helpers: group name -> due_date + stage --------
 
@@ -50,41 +53,114 @@ def get_stage(group_name: str, today: datetime = None):
         return "Current Month"
 
 
+# -------- stage at query time (duckdb) --------
+# same buckets as get_stage, evaluated against current_date on every query,
+# so the groups table only stores due_date and never goes stale.
+# months counted like relativedelta: full months between the two dates (due_date is the 1st)
+STAGE_MACRO_SQL = """
+CREATE OR REPLACE MACRO group_stage(due_date, today) AS
+CASE
+    WHEN due_date IS NULL THEN 'Unknown'
+    WHEN today < due_date THEN
+        CASE WHEN date_diff('month', today, due_date) - CAST(day(today) > 1 AS INTEGER) <= 9
+             THEN 'Pregnant(0 to 9 months)'
+             ELSE 'Pre-pregnancy' END
+    WHEN date_diff('month', due_date, today) BETWEEN 4 AND 16 THEN 'Weaning(4 to 16 months)'
+    WHEN date_diff('month', due_date, today) BETWEEN 1 AND 18 THEN 'Infant(1 to 18 months)'
+    WHEN date_diff('month', due_date, today) BETWEEN 19 AND 60 THEN 'Preschool(18 months to 5yo)'
+    WHEN date_diff('month', due_date, today) BETWEEN 37 AND 72 THEN 'Enrichment(3 to 6yo)'
+    ELSE 'Current Month'
+END
+"""
+
+def create_stage_views(con):
+    """
+    group_stage(due_date, today) macro + group_stages view (groups with their current stage).
+    a stage column left in an old groups table is dropped
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            group_id VARCHAR,
+            group_name VARCHAR,
+            due_date DATE
+        )""")
+    columns = con.execute("SELECT column_name FROM (DESCRIBE groups)").fetchdf()["column_name"].tolist()
+    if "stage" in columns:
+        con.execute("ALTER TABLE groups DROP COLUMN stage")
+    con.execute(STAGE_MACRO_SQL)
+    con.execute("""
+        CREATE OR REPLACE VIEW group_stages AS
+        SELECT group_id, group_name, due_date, group_stage(due_date, current_date) AS stage
+        FROM groups
+    """)
+
+
 # -------- build df_groups from ingestion output --------
+GROUP_COLUMNS = ["group_id", "group_name", "due_date"]
+
+def read_group_names(base_dir="data/processing_output/clean_chat_df", group_ids=None) -> pd.DataFrame:
+    """
+    distinct (group_id, group_name) of the clean parquet files,
+    only these two columns are read (projection), not the whole messages.
+    group_ids: only the files of these groups ({year}/group_{id}.parquet)
+    """
+    if group_ids is None:
+        files = [os.path.join(base_dir, "*", "*.parquet")]
+    else:
+        files = [os.path.join(base_dir, "*", f"group_{gid}.parquet") for gid in group_ids]
+        # a glob matching nothing is an error in duckdb
+        files = [f for f in files if glob.glob(f)]
+    if not files:
+        return pd.DataFrame(columns=["group_id", "group_name"])
+    con = duckdb.connect()
+    try:
+        return con.execute("""
+            SELECT DISTINCT CAST(group_id AS VARCHAR) AS group_id, group_name
+            FROM read_parquet(?, union_by_name=true)
+        """, [files]).fetchdf()
+    finally:
+        con.close()
+
+
+def _group_records(df_names: pd.DataFrame) -> pd.DataFrame:
+    all_records = []
+    for group_id, group_name in df_names[["group_id", "group_name"]].values:
+        due_date = parse_group_name(group_name)
+        all_records.append({
+            "group_id": group_id,
+            "group_name": group_name,
+            "due_date": due_date.date() if due_date else None,
+        })
+    return pd.DataFrame(all_records, columns=GROUP_COLUMNS)
+
+
 def build_groups_from_messages(base_dir="data/processing_output/clean_chat_df",
                                output_csv="data/processing_output/groups.csv",
-                               db_path = "data/chat_cache.duckdb"):
-    """scan all parquet file in directory"""
-    all_records=[]
-    today = datetime.today()
-    for year_folder in sorted(os.listdir(base_dir)):
-        year_path = os.path.join(base_dir, year_folder)
-
-        for file in os.listdir(year_path):
-            if file.endswith(".parquet"):
-                file_path = os.path.join(year_path, file)
-                df = pd.read_parquet(file_path)
-
-                for group_id,group_name in df[["group_id","group_name"]].drop_duplicates().values:
-                    due_date = parse_group_name(group_name)
-                    stage = get_stage(group_name, today)
-                    all_records.append({
-                        "group_id": group_id,
-                        "group_name": group_name,
-                        "due_date": due_date.date() if due_date else None,
-                        "stage": stage
-                    })
-    df_groups = pd.DataFrame(all_records)
-    os.makedirs(os.path.dirname(output_csv),exist_ok=True)
-    df_groups.to_csv(output_csv, index=False)
-    print(f"✅ Saved {len(df_groups)} groups to {output_csv}")
+                               group_ids=None):
+    """
+    groups registry (group_id, group_name, due_date), stage comes from the group_stages view.
+    group_ids=None scans all parquet files and replaces the table,
+    otherwise only the files of the given groups are read and their rows upserted
+    """
+    df_touched = _group_records(read_group_names(base_dir, group_ids))
 
     #write to duckdb
-    con = duckdb.connect(db_path)
-    con.execute("DROP TABLE IF EXISTS groups;")
-    con.execute("""
-        CREATE TABLE groups as SELECT * FROM df_groups""")
-    con.close()
+    with write_connection() as con:
+        con.execute("BEGIN TRANSACTION")
+        if group_ids is None:
+            con.execute("DROP TABLE IF EXISTS groups;")
+        create_stage_views(con)
+        if group_ids is not None:
+            ids = [str(g) for g in group_ids]
+            con.execute("DELETE FROM groups WHERE group_id IN (SELECT unnest(?::VARCHAR[]))", [ids])
+        con.execute("INSERT INTO groups SELECT * FROM df_touched")
+        df_groups = con.execute("SELECT * FROM group_stages ORDER BY group_id").fetchdf()
+        # write_connection rolls back if anything above fails
+        con.execute("COMMIT")
+
+    os.makedirs(os.path.dirname(output_csv),exist_ok=True)
+    df_groups.to_csv(output_csv, index=False)
+    print(f"✅ Saved {len(df_groups)} groups to {output_csv} ({len(df_touched)} updated)")
     return df_groups
 
 
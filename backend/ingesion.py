@@ -7,6 +7,7 @@ import pandas as pd
 from typing import Tuple, List
 from datetime import datetime
 import calendar
+from backend.chat_parser import parse_lines
 
 
 def extract_group_name(file_name: str) -> str:
@@ -49,23 +50,12 @@ def normalize_group_id(group_name):
     return f"{year}{month:02d}"
 
 def parse_txt_lines(lines, group_name):
-    pattern = re.compile(r"\[(.*?)\]\s*~\s*(.*?):\s*(.*)")
-    records = []
+    """ios export lines -> records, multi-line messages are kept whole (see chat_parser)"""
+    df = parse_lines(lines)
     norm_id = normalize_group_id(group_name)
-    for line in lines:
-        
-        match = pattern.match(line)
-        if match:
-            dt_str, user, message = match.groups()
-            dt = datetime.strptime(dt_str, "%d/%m/%y, %H:%M:%S")
-            if re.search(r"your security code with .*? changed", message.lower()):
-                continue 
-            if str(user).strip().lower() in str(message).strip().lower():
-                continue
-            records.append({"datetime": dt, "user": user.strip(), "group_id":str(norm_id),
-                            "text": message.strip(),"group_name":group_name})
-            
-    return records
+    df["group_id"] = str(norm_id)
+    df["group_name"] = group_name
+    return df.to_dict("records")
 
 
 def process_multiple_zips(folder_path: str) -> List[Tuple[str,str]]:
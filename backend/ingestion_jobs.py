@@ -0,0 +1,193 @@
+"""
+background ingestion of uploaded chat zips.
+upload endpoints only save the file and submit a job, parsing / cleaning / group rebuild
+run on a small worker pool and the job status can be polled by id.
+"""
+import os
+import uuid
+import threading
+import traceback
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from backend.data_loader import refresh_duckdb_cache, load_slang_dict
+from backend.group_stage import build_groups_from_messages
+from backend.ingestion_second import ingest_zip, group_id_from_zip, hash_zip_txt
+from backend.ingestion_ledger import get_watermark, save_watermark, find_ingested, record_ingestion
+from backend.reclean import reclean_for_slang
+from backend.db_pool import WRITE_LOCK
+
+# ========================================
+# ⚙️  CONFIG
+# ========================================
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+MAX_PENDING_JOBS = int(os.getenv("INGEST_MAX_PENDING", "20"))
+MAX_KEPT_JOBS = 200   # finished jobs kept in memory for status polling
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+# re-clean jobs run one at a time in submission order: each moves the manifest from the previous
+# slang version to its own, so two quick slang edits are applied as old -> v1 -> v2
+_reclean_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reclean")
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+# the pool's writer lock, re-entrant so the writes inside can take write_connection again
+DB_WRITE_LOCK = WRITE_LOCK
+# two uploads of the same group must not rewrite its parquet files at the same time
+_group_locks = defaultdict(threading.Lock)
+
+FINISHED = ("done", "duplicate", "failed")
+PROGRESS_KEYS = ("messages", "new_messages", "clean_rows")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# ========================================
+# 🧩 job registry
+# ========================================
+def _new_job(file_name: str, kind: str = "upload") -> dict:
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "kind": kind,
+        "file_name": file_name,
+        "status": "queued",
+        "stage": "queued",
+        "progress": {},
+        "result": None,
+        "error": None,
+        "created_at": datetime.now(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    with _jobs_lock:
+        pending = sum(1 for j in _jobs.values() if j["status"] not in FINISHED)
+        if pending >= MAX_PENDING_JOBS:
+            raise QueueFullError(f"{pending} ingestion jobs pending, try again later")
+        _jobs[job["job_id"]] = job
+        # forget the oldest finished jobs
+        finished = [jid for jid, j in _jobs.items() if j["status"] in FINISHED]
+        for jid in finished[:max(0, len(_jobs) - MAX_KEPT_JOBS)]:
+            del _jobs[jid]
+    return job
+
+
+def get_job(job_id: str):
+    """snapshot of one job, None if unknown"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = dict(job)
+        progress = dict(job["progress"])
+    if snapshot["status"] == "running":
+        snapshot["stage"] = progress.get("stage", "running")
+    snapshot["progress"] = {k: progress[k] for k in PROGRESS_KEYS if k in progress}
+    return snapshot
+
+
+def list_jobs(limit: int = 50):
+    with _jobs_lock:
+        job_ids = list(_jobs.keys())[-limit:]
+    return [get_job(jid) for jid in reversed(job_ids)]
+
+
+def _group_lock(group_id: str) -> threading.Lock:
+    with _jobs_lock:
+        return _group_locks[group_id]
+
+
+def _finish(job: dict, status: str, result=None, error=None):
+    job["status"] = status
+    job["stage"] = status
+    job["result"] = result
+    job["error"] = error
+    job["finished_at"] = datetime.now()
+
+
+# ========================================
+# 🧾 pipeline
+# ========================================
+def _run_upload_job(job: dict, uploaded_path: str, archive_sha256: str, force: bool):
+    job["status"] = "running"
+    job["started_at"] = datetime.now()
+    progress = job["progress"]
+    try:
+        # same chat txt inside a different zip -> nothing to do
+        progress["stage"] = "hashing"
+        txt_sha256 = hash_zip_txt(uploaded_path)
+        existing = None if force else find_ingested(txt_sha256=txt_sha256)
+        if existing:
+            _finish(job, "duplicate", result={"group_id": existing["group_id"],
+                                              "group_year": existing["group_year"],
+                                              "ingested_at": existing["ingested_at"]})
+            return
+
+        group_id = group_id_from_zip(uploaded_path)
+        with _group_lock(group_id):
+            # only messages newer than the last upload of this group are cleaned and appended
+            watermark = get_watermark(group_id)
+            result = ingest_zip(uploaded_path, slang_dict=load_slang_dict(), watermark=watermark,
+                                progress=progress)
+            group_id, group_year = result["group_id"], result["group_year"]
+
+            progress["stage"] = "indexing"
+            with DB_WRITE_LOCK:
+                save_watermark(group_id, group_year, result["last_datetime"], result["content_hash"],
+                               result["messages"])
+                record_ingestion(archive_sha256, txt_sha256, job["file_name"], group_id, group_year,
+                                 result["mode"], result["messages"], result["new_messages"])
+                if result["new_messages"]:
+                    try:
+                        build_groups_from_messages(group_ids=[group_id])
+                        refresh_duckdb_cache()
+                        print("group stage data updated, refresh duckdb")
+                    except Exception as e:
+                        print(f"failed to update group stage: {e}")
+
+        _finish(job, "done", result={
+            "group_id": group_id,
+            "group_year": group_year,
+            "mode": result["mode"],
+            "messages": result["messages"],
+            "new_messages": result["new_messages"],
+            "messages_per_sec": result["parse_messages_per_sec"],
+        })
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job, "failed", error=f"{type(e).__name__}: {e}")
+
+
+def submit_upload(uploaded_path: str, file_name: str, archive_sha256: str, force: bool = False) -> dict:
+    """queue an uploaded zip for ingestion, return the job snapshot"""
+    job = _new_job(file_name)
+    _executor.submit(_run_upload_job, job, uploaded_path, archive_sha256, force)
+    return get_job(job["job_id"])
+
+
+def _run_reclean_job(job: dict, tokens: list, old_slang_version: str, slang_dict: dict):
+    job["status"] = "running"
+    job["started_at"] = datetime.now()
+    job["progress"]["stage"] = "recleaning"
+    try:
+        report = reclean_for_slang(tokens, old_slang_version, slang_dict, file_lock=_group_lock)
+        if report["files_recleaned"]:
+            with DB_WRITE_LOCK:
+                refresh_duckdb_cache()
+        _finish(job, "done" if not report["failed"] else "failed", result=report,
+                error=None if not report["failed"] else f"{report['failed']} files failed")
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job, "failed", error=f"{type(e).__name__}: {e}")
+
+
+def submit_reclean(tokens: list, old_slang_version: str, slang_dict: dict) -> dict:
+    """
+    queue a re-clean of the messages containing the changed slang words, return the job snapshot.
+    slang_dict is the dictionary right after this edit, not the one current when the job runs
+    """
+    job = _new_job(None, kind="reclean")
+    _reclean_executor.submit(_run_reclean_job, job, tokens, old_slang_version, dict(slang_dict))
+    return get_job(job["job_id"])
@@ -0,0 +1,140 @@
+import hashlib
+from datetime import datetime
+import duckdb
+import pandas as pd
+from backend.db_pool import read_cursor, write_connection
+
+# === ingestion state kept in duckdb ===
+
+# -----------------------------
+# per group watermark (delta re-upload)
+# -----------------------------
+def init_watermark_table(con):
+    """initialize watermark table(just execute once)"""
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_watermark (
+        group_id VARCHAR PRIMARY KEY,
+        group_year VARCHAR,
+        last_datetime TIMESTAMP,
+        content_hash VARCHAR,
+        messages BIGINT,
+        updated_at TIMESTAMP
+    )
+    """)
+
+
+def get_watermark(group_id: str):
+    """
+    last ingested message time + content hash of everything up to it,
+    None if the group was never ingested
+    """
+    try:
+        with read_cursor() as con:
+            result = con.execute("""
+                SELECT group_id, group_year, last_datetime, content_hash, messages
+                FROM ingest_watermark WHERE group_id = ?
+            """, [str(group_id)]).fetchone()
+    except duckdb.CatalogException:
+        # no upload recorded yet
+        return None
+    if result:
+        return {"group_id": result[0], "group_year": result[1], "last_datetime": result[2],
+                "content_hash": result[3], "messages": result[4]}
+    return None
+
+
+def save_watermark(group_id: str, group_year: str, last_datetime, content_hash: str, messages: int):
+    """insert or move forward the watermark of one group"""
+    with write_connection() as con:
+        init_watermark_table(con)
+        con.execute("""
+            INSERT INTO ingest_watermark VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (group_id) DO UPDATE SET
+                group_year = excluded.group_year,
+                last_datetime = excluded.last_datetime,
+                content_hash = excluded.content_hash,
+                messages = excluded.messages,
+                updated_at = excluded.updated_at
+        """, [str(group_id), str(group_year), last_datetime, content_hash, int(messages), datetime.now()])
+
+
+# -----------------------------
+# ingestion ledger (content-addressed upload dedup)
+# -----------------------------
+LEDGER_COLUMNS = ["archive_sha256", "txt_sha256", "file_name", "group_id", "group_year", "mode",
+                  "messages", "new_messages", "ingested_at"]
+
+def init_ledger_table(con):
+    """initialize ledger table(just execute once)"""
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS ingestion_ledger (
+        archive_sha256 VARCHAR,
+        txt_sha256 VARCHAR,
+        file_name VARCHAR,
+        group_id VARCHAR,
+        group_year VARCHAR,
+        mode VARCHAR,
+        messages BIGINT,
+        new_messages BIGINT,
+        ingested_at TIMESTAMP
+    )
+    """)
+
+
+def hash_stream_to_file(src, dst_path: str, chunk_size: int = 1 << 20) -> str:
+    """copy a file object to dst_path and return the sha256 of its content"""
+    hasher = hashlib.sha256()
+    with open(dst_path, "wb") as buffer:
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            hasher.update(chunk)
+            buffer.write(chunk)
+    return hasher.hexdigest()
+
+
+def find_ingested(archive_sha256: str = None, txt_sha256: str = None):
+    """latest ledger entry with the same archive or chat txt hash, None if never ingested"""
+    if not archive_sha256 and not txt_sha256:
+        return None
+    try:
+        with read_cursor() as con:
+            result = con.execute("""
+                SELECT group_id, group_year, file_name, ingested_at
+                FROM ingestion_ledger
+                WHERE archive_sha256 = ? OR txt_sha256 = ?
+                ORDER BY ingested_at DESC
+                LIMIT 1
+            """, [archive_sha256, txt_sha256]).fetchone()
+    except duckdb.CatalogException:
+        return None
+    if result:
+        return {"group_id": result[0], "group_year": result[1],
+                "file_name": result[2], "ingested_at": result[3]}
+    return None
+
+
+def record_ingestion(archive_sha256: str, txt_sha256: str, file_name: str, group_id: str,
+                     group_year: str, mode: str, messages: int = 0, new_messages: int = 0):
+    """append one entry to the ledger"""
+    with write_connection() as con:
+        init_ledger_table(con)
+        con.execute("""
+            INSERT INTO ingestion_ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [archive_sha256, txt_sha256, file_name, str(group_id), str(group_year), mode,
+              int(messages), int(new_messages), datetime.now()])
+
+
+def list_ingestions(group_id: str = None, limit: int = 100):
+    """what was ingested and when, newest first (the table is created by the first record_ingestion)"""
+    query = "SELECT * FROM ingestion_ledger"
+    params = []
+    if group_id:
+        query += " WHERE group_id = ?"
+        params.append(str(group_id))
+    query += " ORDER BY ingested_at DESC LIMIT ?"
+    params.append(limit)
+    try:
+        with read_cursor() as con:
+            return con.execute(query, params).fetchdf()
+    except duckdb.CatalogException:
+        # nothing ingested yet
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
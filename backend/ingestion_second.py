@@ -3,9 +3,34 @@ import zipfile
 from io import TextIOWrapper
 import os
 import re
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
 import calendar
+import argparse, hashlib, json, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from backend.chat_parser import iter_message_frames, parse_lines
+from backend.cleaning import clean_parquet_file
+from backend.chat_partition import hive_enabled, write_partitioned, delta_months
+from backend.group_stage import build_groups_from_messages
+from backend.data_loader import refresh_duckdb_cache, load_slang_dict_offline
+from backend.ingestion_ledger import save_watermark
+
+# messages parsed per batch, each batch becomes one parquet row group
+BATCH_SIZE = 50_000
+
+# fixed schema so every row group of a group file lines up
+CHAT_SCHEMA = pa.schema([
+    ("datetime", pa.timestamp("us")),
+    ("user", pa.string()),
+    ("group_id", pa.string()),
+    ("text", pa.string()),
+    ("group_name", pa.string()),
+    # position of the message in the chat export (1, 2, ...), stable across delta uploads
+    ("msg_seq", pa.int64()),
+])
 
 # -----------------------------
 # 1️⃣ Extract group name
@@ -23,22 +48,44 @@ def extract_group_name(file_name: str) -> str:
 # -----------------------------
 # 2️⃣ Read .zip and extract .txt
 # -----------------------------
+def find_chat_member(zip_ref: zipfile.ZipFile) -> str:
+    """name of the first txt/text file inside the zip"""
+    # support .txt / .text / .TXT
+    txt_files = [name for name in zip_ref.namelist() if name.lower().endswith((".txt", ".text"))]
+    if not txt_files:
+        raise ValueError("Zip file does not contain any .txt or .text file.")
+    return txt_files[0]
+
 def read_zip_and_extract_txt(zip_path: str):
     """
     Unzip file, extract the first txt/text file content, and return (group_name, chat_lines)
     """
     with zipfile.ZipFile(zip_path, "r") as zip_ref:
-        # support .txt / .text / .TXT
-        txt_files = [name for name in zip_ref.namelist() if name.lower().endswith((".txt", ".text"))]
-        if not txt_files:
-            raise ValueError("Zip file does not contain any .txt or .text file.")
-        first_txt = txt_files[0]
-        with zip_ref.open(first_txt) as file:
+        with zip_ref.open(find_chat_member(zip_ref)) as file:
             chat_lines = TextIOWrapper(file, encoding="utf-8", errors="ignore").read().splitlines()
 
     group_name = extract_group_name(os.path.basename(zip_path))
     return group_name, chat_lines
 
+def iter_zip_lines(zip_path: str):
+    """
+    Stream lines of the first txt/text file in the zip one at a time,
+    without loading the whole chat into memory
+    """
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        with zip_ref.open(find_chat_member(zip_ref)) as file:
+            for line in TextIOWrapper(file, encoding="utf-8", errors="ignore"):
+                yield line.rstrip("\r\n")
+
+def hash_zip_txt(zip_path: str, chunk_size: int = 1 << 20) -> str:
+    """sha256 of the extracted chat .txt, read in chunks"""
+    hasher = hashlib.sha256()
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        with zip_ref.open(find_chat_member(zip_ref)) as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
 # -----------------------------
 # 3️⃣ Normalize group id
 # -----------------------------
@@ -59,105 +106,394 @@ def normalize_group_id(group_name):
 # -----------------------------
 # 4️⃣ Parse chat lines
 # -----------------------------
-def parse_txt_lines(lines, group_name):
+# format sniffing / multi-line folding live in chat_parser (android + ios exports)
+def _with_group(df: pd.DataFrame, group_name, seq_start: int = 1) -> pd.DataFrame:
     """
-    Parse WhatsApp chat lines into structured records.
-    Handles both chat messages and skips system messages.
+    add group columns + msg_seq (numbered from seq_start) to parsed (datetime, user, text) messages,
+    CHAT_SCHEMA column order
     """
-    # e.g. "06/01/2025, 13:03 - +65 9635 7039: Hi there"
-    pattern = re.compile(
-        r"^(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?)\s*-\s*(.*?):\s*(.*)$"
-    )
-    records = []
-    norm_id = normalize_group_id(group_name)
+    df["group_id"] = str(normalize_group_id(group_name))
+    df["group_name"] = group_name
+    df["msg_seq"] = np.arange(seq_start, seq_start + len(df), dtype="int64")
+    return df[list(CHAT_SCHEMA.names)]
+
+def parse_txt_lines(lines, group_name, chat_format=None) -> pd.DataFrame:
+    """
+    Parse WhatsApp chat lines into structured records (one DataFrame).
+    System messages are skipped, continuation lines are kept as part of their message.
+    """
+    return _with_group(parse_lines(lines, chat_format), group_name)
+
+def iter_record_batches(lines, group_name, batch_size: int = BATCH_SIZE):
+    """
+    Parse lines in one pass, yield a DataFrame of records per batch of messages.
+    Only one batch is held in memory at a time, the export format is detected once per file.
+    """
+    seq = 1
+    for df in iter_message_frames(lines, batch_size):
+        if not df.empty:
+            yield _with_group(df, group_name, seq)
+            seq += len(df)
+
+def group_parquet_path(group_id, year, base_dir="data/processing_output/structure_chat"):
+    folder = f"{base_dir}/{year}"
+    os.makedirs(folder, exist_ok=True)
+    return f"{folder}/group_{group_id}.parquet"
 
-    for line in lines:
-        match = pattern.match(line)
-        if match:
-            date_str, time_str, user, message = match.groups()
-            # try two time format（2025 vs 25）
-            dt = None
-            for fmt in ("%d/%m/%Y, %H:%M", "%d/%m/%y, %H:%M"):
-                try:
-                    dt = datetime.strptime(f"{date_str}, {time_str}", fmt)
-                    break
-                except:
-                    continue
-            if not dt:
-                continue
-
-            # jump system msg
-            if re.search(r"(joined|left|added|changed|requested)", message.lower()):
-                continue
-
-            records.append({
-                "datetime": dt,
-                "user": user.strip(),
-                "group_id": str(norm_id),
-                "text": message.strip(),
-                "group_name": group_name
-            })
-
-    return records
 def save_group_parquet(records, group_id, year):
     """save each group_id parquet file"""
-    folder = f"data/processing_output/structure_chat/{year}"
-    os.makedirs(folder, exist_ok=True)
-    path = f"{folder}/group_{group_id}.parquet"
+    path = group_parquet_path(group_id, year)
     df = pd.DataFrame(records)
     df.to_parquet(path, index=False)
     print(f"Saved {path} ({len(df)} messages)")
 
+def save_group_parquet_stream(batches, group_id, year, path: str = None) -> int:
+    """
+    write each batch (DataFrame) of records as its own row group,
+    return the number of messages written (file is removed if nothing was parsed)
+    """
+    path = path or group_parquet_path(group_id, year)
+    tmp_path = f"{path}.tmp"
+    total = 0
+    try:
+        with pq.ParquetWriter(tmp_path, CHAT_SCHEMA) as writer:
+            for df in batches:
+                writer.write_table(pa.Table.from_pandas(df, schema=CHAT_SCHEMA, preserve_index=False))
+                total += len(df)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if total == 0:
+        os.remove(tmp_path)
+        return 0
+    os.replace(tmp_path, path)
+    print(f"Saved {path} ({total} messages)")
+    return total
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """cast an arrow table to schema, columns missing in old files become null"""
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(len(table), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def append_parquet_file(base_path: str, extra_path: str):
+    """
+    append the row groups of extra_path to base_path.
+    existing row groups are copied as they are, nothing is parsed or cleaned again
+    """
+    extra = pq.ParquetFile(extra_path)
+    schema = extra.schema_arrow
+    tmp_path = f"{base_path}.tmp"
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for source in (pq.ParquetFile(base_path), extra):
+                for i in range(source.num_row_groups):
+                    writer.write_table(conform_table(source.read_row_group(i), schema))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, base_path)
+
+def parquet_max_datetime(path: str):
+    """latest message time of a parquet file, read from the row group statistics only"""
+    if not os.path.exists(path):
+        return None
+    metadata = pq.ParquetFile(path).metadata
+    col = metadata.schema.to_arrow_schema().get_field_index("datetime")
+    maxima = []
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(col).statistics
+        if stats is None or not stats.has_min_max:
+            return None
+        maxima.append(stats.max)
+    return pd.Timestamp(max(maxima)).to_pydatetime() if maxima else None
+
+# -----------------------------
+# watermark: content hash of messages
+# -----------------------------
+def hash_messages(df: pd.DataFrame, hasher):
+    """update hasher with (datetime, user, text) of every message, in file order"""
+    if df.empty:
+        return
+    rows = (df["datetime"].dt.strftime("%Y-%m-%d %H:%M:%S") + "\x1f"
+            + df["user"].astype(str) + "\x1f" + df["text"].astype(str))
+    hasher.update(("\n".join(rows.tolist()) + "\n").encode("utf-8"))
+
+def track_batches(batches, stats: dict, watermark: dict = None):
+    """
+    pass batches through while recording count / last datetime / content hash.
+    with a watermark, messages up to it are only hashed (to check the history is unchanged)
+    and just the newer ones are yielded
+    """
+    full_hash, prefix_hash = hashlib.sha256(), hashlib.sha256()
+    stats.update(messages=0, new_messages=0, prefix_messages=0, last_datetime=None)
+    for df in batches:
+        hash_messages(df, full_hash)
+        stats["messages"] += len(df)
+        batch_max = df["datetime"].max().to_pydatetime()
+        stats["last_datetime"] = max(stats["last_datetime"] or batch_max, batch_max)
+        if watermark:
+            seen = df["datetime"] <= watermark["last_datetime"]
+            hash_messages(df[seen], prefix_hash)
+            stats["prefix_messages"] += int(seen.sum())
+            df = df[~seen]
+        stats["new_messages"] += len(df)
+        if not df.empty:
+            yield df
+    stats["content_hash"] = full_hash.hexdigest()
+    stats["prefix_hash"] = prefix_hash.hexdigest()
+
 # -----------------------
 # proces single zip uploaded
 # -----------------------
-def process_single_file(zip_path:str):
+def group_id_from_zip(zip_path: str):
+    """WhatsApp Chat - 2025 DEC SG Mummys.zip -> 202512"""
+    return normalize_group_id(extract_group_name(os.path.basename(zip_path)))
+
+def process_single_file(zip_path:str, watermark: dict = None, stats: dict = None):
     """frontend upload file,
-    unzip, save as parquet file"""
-    group_name,chat_text = read_zip_and_extract_txt(zip_path)
-    records= parse_txt_lines(chat_text,group_name)
-    if not records:
+    unzip, stream parse and save as parquet file batch by batch.
+    with the group watermark, only messages newer than it are written to a .delta file
+    (delta mode, see ingest_zip for the append), falls back to a full rewrite
+    if the already ingested history changed.
+    stats (optional) is updated in place while parsing, so callers can report progress.
+    return (parquet path holding the messages to clean, group_id, group_year, ingest stats)"""
+    group_name = extract_group_name(os.path.basename(zip_path))
+    norm_id = normalize_group_id(group_name)
+    if not norm_id:
+        raise ValueError(f"Can not get group id from file name: {group_name}")
+    group_id, group_year = norm_id, norm_id[:4]
+    base_path = group_parquet_path(group_id, group_year)
+    if watermark and parquet_max_datetime(base_path) != watermark["last_datetime"]:
+        # stored file and watermark out of sync (missing file / half applied delta)
+        watermark = None
+
+    start = time.perf_counter()
+    stats = {} if stats is None else stats
+    out_path = f"{base_path}.delta" if watermark else base_path
+    batches = track_batches(iter_record_batches(iter_zip_lines(zip_path), group_name), stats, watermark)
+    save_group_parquet_stream(batches, group_id, group_year, path=out_path)
+    if stats["messages"] == 0:
         raise ValueError("No Valid Message in uploaded file")
-    group_id = records[0]["group_id"]
-    group_year = normalize_group_id(group_name)[:4]
-    save_group_parquet(records,group_id,group_year)
-    df= pd.DataFrame(records)
-    return df,group_id,group_year
+
+    if watermark:
+        unchanged = (stats["prefix_hash"] == watermark["content_hash"]
+                     and stats["prefix_messages"] == watermark["messages"])
+        if not unchanged:
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            print(f"History of group {group_id} changed since last upload, full re-ingest")
+            return process_single_file(zip_path, stats=stats)
+        if not stats["new_messages"]:
+            out_path = base_path
+        stats["mode"] = "delta"
+    else:
+        stats["mode"] = "full"
+
+    stats.update(ingest_stats(stats["messages"], time.perf_counter() - start))
+    print(f"Ingested {group_name} ({stats['mode']}): {stats['new_messages']} new of {stats['messages']} messages, "
+          f"{stats['messages_per_sec']} msg/s")
+    return out_path, group_id, group_year, stats
+
+def ingest_stats(messages: int, seconds: float) -> dict:
+    return {
+        "messages": messages,
+        "seconds": round(seconds, 3),
+        "messages_per_sec": round(messages / seconds, 1) if seconds > 0 else None,
+    }
 
 # -----------------------------
 # 5️⃣ Process multiple ZIPs
 # -----------------------------
-def process_multiple_zips(folder_path: str) -> pd.DataFrame:
+def ingest_zip(zip_path: str, clean: bool = True, slang_dict=None, watermark: dict = None,
+               progress: dict = None) -> dict:
     """
-    Process all zip files in a folder, return independent parquet file
-    based on group id.
+    parse one zip into structure_chat (and clean_chat_df when clean=True),
+    in delta mode only the new messages are cleaned and appended.
+    progress (optional) gets the current stage and message counts while running.
+    return a small result dict for the bulk summary report / watermark update
     """
-    all_records = []
+    start = time.perf_counter()
+    progress = {} if progress is None else progress
+    progress["stage"] = "parsing"
+    structure_path, group_id, group_year, stats = process_single_file(zip_path, watermark, stats=progress)
+    progress["stage"] = "cleaning"
+    result = {
+        "file": os.path.basename(zip_path),
+        "group_id": group_id,
+        "group_year": group_year,
+        "mode": stats["mode"],
+        "messages": stats["messages"],
+        "new_messages": stats["new_messages"],
+        "last_datetime": stats["last_datetime"],
+        "content_hash": stats["content_hash"],
+        "parse_messages_per_sec": stats["messages_per_sec"],
+        "clean_rows": None,
+    }
+    clean_path = f"data/processing_output/clean_chat_df/{group_year}/group_{group_id}.parquet"
+    if stats["mode"] == "delta" and stats["new_messages"]:
+        # structure_path is the .delta file holding only the new messages
+        base_path = group_parquet_path(group_id, group_year)
+        delta_clean_path = f"{clean_path}.delta"
+        try:
+            if clean and os.path.exists(clean_path):
+                result["clean_rows"] = clean_parquet_file(structure_path, delta_clean_path, slang_dict)
+                append_parquet_file(clean_path, delta_clean_path)
+                if hive_enabled():
+                    # only the months the new messages fall in
+                    write_partitioned(clean_path, group_id, months=delta_months(delta_clean_path))
+            append_parquet_file(base_path, structure_path)
+            if clean and result["clean_rows"] is None:
+                # cleaned file is gone, clean the whole group again
+                result["clean_rows"] = clean_parquet_file(base_path, clean_path, slang_dict)
+                if hive_enabled():
+                    write_partitioned(clean_path, group_id)
+        finally:
+            for path in (structure_path, delta_clean_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    elif clean and stats["mode"] == "full":
+        result["clean_rows"] = clean_parquet_file(structure_path, clean_path, slang_dict)
+        if hive_enabled():
+            write_partitioned(clean_path, group_id)
+    progress["clean_rows"] = result["clean_rows"]
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["worker_pid"] = os.getpid()
+    return result
+
+def _ingest_zip_safe(zip_path: str, clean: bool, slang_dict, watermark: dict = None) -> dict:
+    """worker entry, never raise so one bad file does not stop the pool"""
+    try:
+        return {"ok": True, **ingest_zip(zip_path, clean, slang_dict, watermark=watermark)}
+    except Exception as e:
+        return {"ok": False, "file": os.path.basename(zip_path),
+                "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc()}
+
+def _ingest_group_safe(zip_paths: list, clean: bool, slang_dict) -> list:
+    """
+    worker entry for all zips of one group, one after another (they write the same parquet files).
+    every zip after the first is applied on top of the previous one like an upload (delta if its history
+    is unchanged, full rewrite otherwise)
+    """
+    results, watermark = [], None
+    for path in zip_paths:
+        res = _ingest_zip_safe(path, clean, slang_dict, watermark)
+        results.append(res)
+        if res["ok"]:
+            watermark = {"group_id": res["group_id"], "group_year": res["group_year"],
+                         "last_datetime": res["last_datetime"], "content_hash": res["content_hash"],
+                         "messages": res["messages"]}
+    return results
+
+def _group_zips(zip_paths: list) -> list:
+    """zips grouped by group id (oldest export first), zips without a group id on their own"""
+    groups = {}
+    for path in zip_paths:
+        groups.setdefault(group_id_from_zip(path) or path, []).append(path)
+    return [sorted(paths, key=lambda p: (os.path.getmtime(p), p)) for paths in groups.values()]
+
+def process_multiple_zips(folder_path: str, workers: int = None, clean: bool = True,
+                          slang_dict=None, rebuild: bool = True) -> dict:
+    """
+    Process all zip files in a folder, write independent parquet file
+    based on group id. Files are spread over a process pool (workers=1 runs inline),
+    with rebuild=True watermarks, groups table and duckdb cache are updated once at the end.
+    return a summary report of per-file results and errors
+    """
+    zip_paths = sorted(
+        os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.lower().endswith(".zip")
+    )
+    # exports of the same group must not run at the same time, one task per group
+    group_tasks = _group_zips(zip_paths)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(group_tasks) or 1))
+    start = time.perf_counter()
+    results, errors = [], []
+
+    def collect(res):
+        if res["ok"]:
+            results.append(res)
+            print(f"✅ Processed {res['file']}: {res['messages']} messages ({res['seconds']}s, "
+                  f"parse {res['parse_messages_per_sec']} msg/s)")
+        else:
+            errors.append(res)
+            print(f"Error processing {res['file']}: {res['error']}")
+
+    if workers == 1:
+        for paths in group_tasks:
+            for res in _ingest_group_safe(paths, clean, slang_dict):
+                collect(res)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_ingest_group_safe, paths, clean, slang_dict) for paths in group_tasks]
+            for future in as_completed(futures):
+                for res in future.result():
+                    collect(res)
 
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(".zip"):
-            path = os.path.join(folder_path, filename)
-            try:
-                group_name, chat_text = read_zip_and_extract_txt(path)
-                records = parse_txt_lines(chat_text, group_name)
-                if not records:
-                    print(f"No valid messages found in {filename}")
-                    continue
+    # dashboard database, once for the whole batch (rebuild=False: left to the api server)
+    if rebuild and results:
+        try:
+            # bulk runs are full re-ingests, record the watermarks so later uploads can be delta
+            # (results of one group are in processing order, the last one wins)
+            for res in results:
+                save_watermark(res["group_id"], res["group_year"], res["last_datetime"],
+                               res["content_hash"], res["messages"])
+            # rebuild groups + duckdb view
+            if clean:
+                build_groups_from_messages(group_ids=sorted({r["group_id"] for r in results}))
+                refresh_duckdb_cache()
+        except Exception as e:
+            errors.append({"ok": False, "file": None, "error": f"rebuild failed: {e}"})
+            print(f"failed to update group stage: {e}")
 
-                group_id = records[0]["group_id"]
-                year = normalize_group_id(group_name)[:4]
-                save_group_parquet(records, group_id, year)
-                print(f"✅ Processed {filename}: {len(records)} messages")
+    elapsed = time.perf_counter() - start
+    total_messages = sum(r["messages"] for r in results)
+    report = {
+        "folder": folder_path,
+        "workers": workers,
+        "files": len(zip_paths),
+        "succeeded": len(results),
+        "failed": len(errors),
+        "messages": total_messages,
+        "seconds": round(elapsed, 2),
+        "messages_per_sec": round(total_messages / elapsed, 1) if elapsed > 0 else None,
+        "results": sorted(results, key=lambda r: r["file"]),
+        "errors": errors,
+    }
+    return report
 
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
+def save_ingest_report(report: dict, output_dir="data/processing_output/ingest_reports") -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"ingest_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
 
 
 # -----------------------------
 # 6️⃣ Main entry
 # -----------------------------
 if __name__ == "__main__":
-    folder = "data/chat_zip/2024"
-    process_multiple_zips(folder)
-    print("✅ All zip files process successfully")
+    # python -m backend.ingestion_second data/chat_zip/2024 --workers 8
+    parser = argparse.ArgumentParser(description="bulk ingest whatsapp zip exports")
+    parser.add_argument("folder", nargs="?", default="data/chat_zip/2024")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size, default cpu count")
+    parser.add_argument("--no-clean", action="store_true", help="only write structure_chat")
+    parser.add_argument("--update-db", action="store_true",
+                        help="also update watermarks / groups / chat table in the dashboard database "
+                             "(the api server must be stopped, it holds the database lock)")
+    args = parser.parse_args()
 
+    report = process_multiple_zips(args.folder, workers=args.workers, clean=not args.no_clean,
+                                   slang_dict=load_slang_dict_offline(), rebuild=args.update_db)
+    report_path = save_ingest_report(report)
+    print(f"✅ {report['succeeded']}/{report['files']} zip files processed with {report['workers']} workers, "
+          f"{report['messages']} messages in {report['seconds']}s, report: {report_path}")
+    if not args.update_db:
+        print("dashboard database not touched: the chat table picks the new files up on the next server start, "
+              "run with --update-db while the server is stopped to also update groups / watermarks")
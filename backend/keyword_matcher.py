@@ -0,0 +1,103 @@
+"""
+one keyword matcher for every router.
+a keyword set is compiled once into a token trie, each text is tokenized once and walked through it,
+so counting is one pass per text instead of one regex per keyword per text.
+    matcher = get_matcher(keywords, plurals=True)
+    matcher.count(texts)                       # messages mentioning each keyword
+    matcher.count(texts, mode="occurrences")   # every mention
+match rules are the ones of the old per-keyword regex (?<!\\w)keyword(?!\\w):
+case-insensitive, whole words only, quotes / apostrophes ignored, "-" in a keyword also matches a space
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+# word tokens and single punctuation chars, whitespace dropped
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_END = object()   # trie key of the keywords ending at a node
+
+
+def normalize(text) -> str:
+    """same as the routers' _normalize_quotes: curly quotes -> ', lower, apostrophes removed"""
+    if not isinstance(text, str):
+        return ""
+    return text.replace("’", "'").replace("‘", "'").replace("`", "'").lower().replace("'", "")
+
+
+def tokenize(text) -> list:
+    # "-" is dropped on both sides so "s-26" matches "s-26" and "s 26"
+    return [t for t in _TOKEN_RE.findall(normalize(text)) if t != "-"]
+
+
+def plural_forms(token: str) -> set:
+    """the token and its plurals, e.g. diaper -> diapers, box -> boxes, baby -> babies"""
+    forms = {token, token + "s", token + "es"}
+    if len(token) > 1 and token.endswith("y") and token[-2] not in "aeiou":
+        forms.add(token[:-1] + "ies")
+    return forms
+
+
+class KeywordMatcher:
+    def __init__(self, keywords, plurals: bool = False):
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k))
+        self.plurals = plurals
+        self._trie = {}
+        exact = {tuple(tokenize(kw)) for kw in self.keywords}
+        for kw in self.keywords:
+            tokens = tokenize(kw)
+            if not tokens:
+                continue
+            # plurals: the message text is left as is, the keyword's last word gets its plural forms
+            # (singularizing the messages would also turn "news" into "new", "kids" into "kid").
+            # a plural form that is itself a keyword ("new" / "news") only counts for that keyword
+            last_forms = {tokens[-1]}
+            if plurals:
+                last_forms |= {f for f in plural_forms(tokens[-1]) if (*tokens[:-1], f) not in exact}
+            node = self._trie
+            for token in tokens[:-1]:
+                node = node.setdefault(token, {})
+            for form in last_forms:
+                ends = node.setdefault(form, {}).setdefault(_END, [])
+                if kw not in ends:
+                    ends.append(kw)
+
+    def find(self, text) -> list:
+        """[(keyword, start token, end token)], non-overlapping per keyword like re.findall"""
+        tokens = tokenize(text)
+        matches = []
+        last_end = {}
+        for start in range(len(tokens)):
+            node = self._trie.get(tokens[start])
+            end = start + 1
+            while node is not None:
+                for kw in node.get(_END, ()):
+                    if last_end.get(kw, 0) <= start:
+                        matches.append((kw, start, end))
+                        last_end[kw] = end
+                if end >= len(tokens):
+                    break
+                node = node.get(tokens[end])
+                end += 1
+        return matches
+
+    def count(self, texts, mode: str = "messages") -> Counter:
+        """
+        mode="messages": number of texts mentioning each keyword
+        mode="occurrences": number of mentions
+        keywords never found are not in the Counter
+        """
+        counts = Counter()
+        for text in texts:
+            found = [kw for kw, _, _ in self.find(text)]
+            counts.update(set(found) if mode == "messages" else found)
+        return counts
+
+
+@lru_cache(maxsize=64)
+def _compiled(keywords: tuple, plurals: bool) -> KeywordMatcher:
+    return KeywordMatcher(keywords, plurals)
+
+
+def get_matcher(keywords, plurals: bool = False) -> KeywordMatcher:
+    """compiled matcher of a keyword set, cached per set (an admin change gives a new set -> new matcher)"""
+    return _compiled(tuple(sorted(set(k for k in keywords if k))), plurals)
@@ -0,0 +1,127 @@
+"""
+selective re-clean after a slang update.
+only the structure_chat files with a message containing one of the changed slang words
+are cleaned again, the rest of clean_chat_df is kept as it is.
+"""
+import os
+import glob
+import time
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+
+import duckdb
+
+from backend.cleaning import (clean_parquet_file, slang_version, file_fingerprint, load_clean_manifest,
+                              save_clean_manifest, normalize_for_slang, slang_prefilter_sql, slang_word_pattern,
+                              CLEANER_VERSION, CLEAN_MANIFEST_PATH)
+from backend.chat_partition import hive_enabled, write_partitioned
+
+STRUCTURE_BASE = "data/processing_output/structure_chat"
+CLEAN_BASE = "data/processing_output/clean_chat_df"
+MANIFEST_LOCK = threading.Lock()
+
+
+def find_files_with_slang(tokens, input_base: str = STRUCTURE_BASE) -> dict:
+    """
+    {input parquet path: matching messages} for every structure_chat file where a message contains
+    one of the slang words, as the word-boundary slang regex sees it after the cleaning steps before
+    the slang replacement (urls / numbers / emoji removed, punctuation, repeated chars...), e.g. "see 2 u" -> "see u".
+    duckdb scans the raw text of all files with slang_prefilter_sql, only the messages it picks
+    go through normalize_for_slang in python.
+    not the chat table: messages cleaned to nothing (e.g. "u" -> "you", a stopword) are not in it,
+    with the new dictionary they may not be empty anymore
+    """
+    tokens = sorted({t.lower().strip() for t in tokens if t and t.strip()})
+    paths = sorted(glob.glob(os.path.join(input_base, "*", "*.parquet")))
+    if not tokens or not paths:
+        return {}
+    con = duckdb.connect()  # in memory, only reads the parquet files
+    try:
+        con.execute("SET enable_progress_bar = false")
+        rows = con.execute(f"SELECT filename, text FROM read_parquet(?, filename = true) "
+                           f"WHERE {slang_prefilter_sql(tokens)}", [paths]).fetchall()
+    finally:
+        con.close()
+
+    pattern = slang_word_pattern(tokens)
+    found = {}
+    for (path, _), text in zip(rows, normalize_for_slang([text for _, text in rows])):
+        if pattern.search(text):
+            path = os.path.normpath(path)
+            found[path] = found.get(path, 0) + 1
+    return found
+
+
+def clean_output_path(input_path: str, input_base: str = STRUCTURE_BASE, output_base: str = CLEAN_BASE) -> str:
+    return os.path.join(output_base, os.path.relpath(input_path, input_base))
+
+
+def reclean_for_slang(tokens, old_slang_version: str, slang_dict: dict,
+                      input_base: str = STRUCTURE_BASE, output_base: str = CLEAN_BASE,
+                      manifest_path: str = CLEAN_MANIFEST_PATH, file_lock=None) -> dict:
+    """
+    re-clean only the files containing the changed slang words with the new slang_dict.
+    files cleaned with the previous dictionary (old_slang_version) that do not contain them
+    are marked current for the new one in the clean manifest.
+    file_lock(group_id) -> lock, held while a group's clean file is rewritten
+    """
+    start = time.perf_counter()
+    new_version = slang_version(slang_dict)
+    affected = find_files_with_slang(tokens, input_base)
+    scan_seconds = time.perf_counter() - start
+
+    cleaned, errors, rows, updates = [], [], 0, {}
+    for input_path, messages in sorted(affected.items()):
+        output_path = clean_output_path(input_path, input_base, output_base)
+        group_id = os.path.basename(input_path)[len("group_"):-len(".parquet")]
+        try:
+            with (file_lock(group_id) if file_lock else nullcontext()):
+                fingerprint = file_fingerprint(input_path)
+                n_rows = clean_parquet_file(input_path, output_path, slang_dict)
+                if hive_enabled():
+                    write_partitioned(output_path, group_id)
+        except Exception as e:
+            errors.append({"input": input_path, "error": f"{type(e).__name__}: {e}"})
+            print(f"❌ Error re-cleaning {input_path}: {e}")
+            continue
+        rows += n_rows
+        cleaned.append({"file": output_path, "messages_with_slang": messages, "rows": n_rows})
+        updates[output_path] = {
+            "input": input_path,
+            "input_fingerprint": fingerprint,
+            "slang_version": new_version,
+            "cleaner_version": CLEANER_VERSION,
+            "rows": n_rows,
+            "cleaned_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    # untouched files give the same output with the new dictionary
+    touched = {c["file"] for c in cleaned} | {clean_output_path(e["input"], input_base, output_base) for e in errors}
+    carried = 0
+    # load / modify / save in one step, another re-clean may have saved the manifest meanwhile
+    with MANIFEST_LOCK:
+        manifest = load_clean_manifest(manifest_path)
+        manifest.update(updates)
+        for output_path, entry in manifest.items():
+            if (output_path not in touched and entry.get("slang_version") == old_slang_version
+                    and entry.get("cleaner_version") == CLEANER_VERSION):
+                entry["slang_version"] = new_version
+                carried += 1
+        save_clean_manifest(manifest, manifest_path)
+
+    report = {
+        "tokens": sorted(tokens),
+        "slang_version": new_version,
+        "files_recleaned": len(cleaned),
+        "files_unchanged": carried,
+        "failed": len(errors),
+        "rows": rows,
+        "scan_seconds": round(scan_seconds, 3),
+        "seconds": round(time.perf_counter() - start, 3),
+        "files": cleaned,
+        "errors": errors,
+    }
+    print(f"✅ Slang {report['tokens']}: re-cleaned {len(cleaned)} files ({rows} rows) in {report['seconds']}s, "
+          f"{carried} files unchanged")
+    return report
@@ -10,11 +10,10 @@ from sentence_transformers import SentenceTransformer, util
 import spacy
 from sklearn.cluster import KMeans
 from backend.data_loader import query_chat, load_default_groups,load_groups_by_year
+from backend.keyword_matcher import get_matcher, KeywordMatcher
 
 router = APIRouter()
-DB_PATH="data/chat_cache.duckdb"
 def load_cat_data():
-    con= duckdb.connect(DB_PATH)
     query = """
     SELECT 
         b.brand_name AS brand,
@@ -24,8 +23,7 @@ def load_cat_data():
     JOIN brands b ON k.brand_id = b.brand_id
     JOIN categories c ON b.category_id = c.category_id
     """
-    df_cat = con.execute(query).fetchdf()
-    con.close()
+    df_cat = query_chat(query)
     return df_cat 
 
 def build_brand_map():
@@ -40,38 +38,9 @@ def build_brand_map():
     brand_keyword_dict = df_cat.groupby("brand")["keyword"].apply(list).to_dict()
     return brand_list, brand_category_map, brand_keyword_dict
 
-def _normalize_quotes(s: str) -> str:
-    if not isinstance(s, str):
-        return ""
-    return (
-        s.replace("'", "'")
-         .replace("'", "'")
-         .replace("`", "'")
-         .lower()
-         .replace("'", "")
-         .strip()
-    )
-
-
-def _build_keyword_pattern(kw: str) -> re.Pattern:
-    k = _normalize_quotes(kw)
-    k = re.escape(k)
-
-    k = k.replace(r"\-", r"(?:-|\\s)")
-
-    k = k.replace(r"\ ", r"\s+")
-    return re.compile(rf"(?<!\w){k}(?!\w)", flags=re.IGNORECASE)
-
-
 def count_kw(context_texts, keywords):
-    patterns = {kw: _build_keyword_pattern(kw) for kw in keywords}
-    cnt = Counter()
-    for text in context_texts:
-        t = _normalize_quotes(text)
-        for kw,patt in patterns.items():
-            if patt.search(t):
-                cnt[kw]+=1
-    return cnt
+    """messages mentioning each keyword"""
+    return get_matcher(keywords).count(context_texts)
 
 #---------- define filter function---------
 def filter_df(df: pd.DataFrame, time: int, granularity):
@@ -229,12 +198,8 @@ def extract_clean_brand_keywords_auto(texts, brand_name, top_k=15):
     filtered_keywords = remove_overlapping_phrases(filtered_keywords,overlap_ratio=0.5)
 
     # Step 6️⃣ count the frequency in original text
-    counts = Counter()
-    for text in texts:
-        t = text.lower()
-        for kw in filtered_keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", t):
-                counts[kw] += 1
+    # keywords of this request only, so not the cached get_matcher
+    counts = KeywordMatcher(filtered_keywords).count(texts)
 
     results = [{"word": k, "count": v} for k, v in sorted(counts.items(), key=lambda x: x[1], reverse=True)]
     return results
@@ -345,7 +310,7 @@ def category_keyword_frequency_sql(
     query = """
     SELECT 
         group_id, year, month, quarter,
-        row_number() OVER (PARTITION BY group_id ORDER BY datetime) AS row_id,
+        msg_seq AS row_id,
         clean_text
     FROM chat 
     WHERE clean_text IS NOT NULL
@@ -385,18 +350,17 @@ def category_keyword_frequency_sql(
         if df_subset.empty:
             return {"total_mentions": 0, "keywords": []}
 
-        duckdb.register("df_temp", df_subset)
 
 
         brand_pattern = "|".join([re.escape(b.lower()) for b in brand_in_category])
         keyword_values_sql = ", ".join([f"('{re.escape(k)}')" for k in category_keywords])
 
-        total_mentions = duckdb.sql(f"""
+        total_mentions = query_chat(f"""
             SELECT COUNT(*) AS total_mentions
             FROM (
                 SELECT UNNEST(regexp_extract_all(lower(clean_text), '(?i)\\b({brand_pattern})\\b')) AS match
             FROM df_temp) t
-        """).fetchone()[0]
+        """, frames={"df_temp": df_subset}).iloc[0, 0]
 
 
         query_sql = f"""
@@ -432,8 +396,7 @@ def category_keyword_frequency_sql(
         ORDER BY count DESC
         """
 
-        df_result = duckdb.sql(query_sql).df()
-        duckdb.unregister("df_temp")
+        df_result = query_chat(query_sql, frames={"df_temp": df_subset})
 
         
         if df_result.empty:
@@ -474,7 +437,6 @@ def count_keywords_sql(
     if df_subset.empty:
         return []
 
-    duckdb.register("df_temp", df_subset)
 
     # 1️⃣ SQL-safe regex patterns
     brand_pattern = re.escape(brand.lower())
@@ -513,8 +475,7 @@ def count_keywords_sql(
     ORDER BY count DESC
     """
 
-    df_result = duckdb.sql(query).df()
-    duckdb.unregister("df_temp")
+    df_result = query_chat(query, frames={"df_temp": df_subset})
 
     return df_result.to_dict(orient="records")
 
@@ -557,7 +518,7 @@ def category_keyword_frequency_sql(
     query = """
         SELECT 
             group_id, year, month, quarter,
-            row_number() OVER (PARTITION BY group_id ORDER BY datetime) AS row_id,
+            msg_seq AS row_id,
             clean_text
         FROM chat
         WHERE clean_text IS NOT NULL
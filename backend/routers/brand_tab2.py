@@ -11,7 +11,9 @@ from keybert import KeyBERT
 from sentence_transformers import SentenceTransformer, util
 import spacy
 from transformers import pipeline
-from backend.data_loader import query_chat,load_default_groups,load_groups_by_year,get_cached_sentiment,save_sentiment_cache
+from backend.data_loader import query_chat,load_default_groups,load_groups_by_year,get_cached_sentiments,save_sentiment_cache_many
+from backend.data_loader import REGEX_RULE,sentiment_model_version,sentiment_rule_hash
+from backend.keyword_matcher import get_matcher
 
 router = APIRouter()
 
@@ -90,7 +92,7 @@ def keyword_frequency(
     query = """
     SELECT 
         group_id,
-        row_number() over (PARTITION BY group_id ORDER BY datetime) AS row_id,
+        msg_seq AS row_id,
         clean_text 
     FROM chat WHERE clean_text IS NOT NULL"""
     params = []
@@ -140,12 +142,8 @@ def keyword_frequency(
         context_texts.extend(c["context"])
 
     # ---- 6. count keyword frequency ----
-    freq_counter = Counter()
-    for text in context_texts:
-        t = text.lower()
-        for kw in all_keywords:
-            if re.search(rf"\b{re.escape(kw.lower())}\b", t):
-                freq_counter[kw] += 1
+    # one pass per message, plural mentions count for the keyword (diapers -> diaper)
+    freq_counter = get_matcher(all_keywords, plurals=True).count(context_texts)
 
     # fall back: return common words
     if not freq_counter:
@@ -184,6 +182,9 @@ sentiment_model = pipeline(
     top_k=1,
     truncation=True  #cut more than 512
 )
+# cache entries are only valid for this model / rule file
+MODEL_VERSION = sentiment_model_version("./roberta-sentiment-finetuned")
+RULE_HASH = sentiment_rule_hash(CONFIG)
 
 def regex_override_label(text: str, base_sentiment: str) -> str:
     """based on rule.json overwrite sentiment"""
@@ -207,39 +208,37 @@ def analyze_sentiment(texts,sentiment_model,regex_override_label):
     if not texts:
         return sentiment_result, detailed_examples
 
-    # check existing cach
-    cached_results = {}
-    uncached_texts = []
-    for text in texts:
-        cached = get_cached_sentiment(text)
-        if cached:
-            cached_results[text]=cached
-        else:
-            uncached_texts.append(text)
+    # check existing cache, one lookup for the whole list
+    # (entries of an older rule file are re-labelled from the stored model label, no inference)
+    cached_results = get_cached_sentiments(texts, MODEL_VERSION, RULE_HASH, relabel=regex_override_label)
+    unique_texts = list(dict.fromkeys(texts))
+    uncached_texts = [text for text in unique_texts if text not in cached_results]
+
     # Only run model inference on uncached texts
     if uncached_texts:
         preds = sentiment_model(uncached_texts, batch_size=32)
+        new_records = []
         for i, text in enumerate(uncached_texts):
             pred = preds[i][0]
             sentiment = pred["label"].lower()
             score = round(pred["score"], 3)
             rule = None
-            print("model inference")
             final_sentiment = regex_override_label(text, sentiment)
             if final_sentiment != sentiment:
-                rule = "regex overwrite"
-            save_sentiment_cache(text, final_sentiment, score, rule)
+                rule = REGEX_RULE
+            new_records.append((text, sentiment, final_sentiment, score, rule))
             cached_results[text] = {
                 "sentiment": final_sentiment,
                 "score": score,
                 "rule_applied": rule
             }
+        # all new predictions written in one transaction
+        save_sentiment_cache_many(new_records, MODEL_VERSION, RULE_HASH)
 
     # Log cache hits (for visibility)
-    for text in texts:
-        if text not in uncached_texts:
-            print("cached hit")
-
+    # counted over distinct texts, a repeated text is looked up / inferred once
+    print(f"sentiment: {len(unique_texts)} distinct texts, {len(unique_texts) - len(uncached_texts)} cached hit, "
+          f"{len(uncached_texts)} model inference")
     for text in texts:
         data = cached_results[text]
         sentiment_result[data["sentiment"]] += 1
@@ -12,13 +12,10 @@ from backend.data_loader import load_groups_by_year, load_default_groups, query_
 from itertools import combinations
 
 router = APIRouter()
-DB_PATH="data/chat_cache.duckdb"
-con= duckdb.connect(DB_PATH)
-df_kw = con.execute("SELECT gen_keyword FROM general_keywords").fetchdf()
+df_kw = query_chat("SELECT gen_keyword FROM general_keywords")
 
 #df_kw = pd.read_csv("data/other_data/general_kw_list.csv")
 keyword_list = df_kw['gen_keyword'].tolist()
-con.close()
 
 #define filter function
 def filter_df(df: pd.DataFrame, time: int, granularity):
@@ -30,6 +27,33 @@ def filter_df(df: pd.DataFrame, time: int, granularity):
         elif granularity == "quarter":
             y, q = divmod(time, 10)
             return df[(df["year"] == y) & (df["quarter"] == q)]
+
+def period_sql(granularity) -> str:
+    """sql expression giving the same time code as the api (2025 / 202503 / 20251)"""
+    if granularity == "year":
+        return "year"
+    elif granularity == "month":
+        return "year * 100 + month"
+    elif granularity == "quarter":
+        return "year * 10 + quarter"
+
+def keyword_variants(keywords):
+    """
+    single-word keywords -> (token, keyword) pairs for the plural forms matched before (kw, kw+s, kw+es),
+    multi-word keywords are returned apart, they can not be matched on one token
+    """
+    variants, keywords_, phrases = [], [], []
+    for kw in keywords:
+        k = kw.lower().strip()
+        if not k:
+            continue
+        if " " in k:
+            phrases.append(kw)
+            continue
+        for v in (k, k + "s", k + "es"):
+            variants.append(v)
+            keywords_.append(kw)
+    return variants, keywords_, phrases
         
 @router.get("/keyword-frequency")
 def keyword_frequency(granularity: Literal["year", "month", "quarter"],
@@ -38,65 +62,71 @@ def keyword_frequency(granularity: Literal["year", "month", "quarter"],
                       group_id: Optional[List[str]] = Query(None),
                       group_year: Optional[List[int]]=Query(None),
                       stage: Optional[str]=None):
-    #df_stage= pd.read_csv("data/processing_output/groups.csv",dtype={"group_id":str})
-    con= duckdb.connect(DB_PATH)
-    df_stage = con.execute("SELECT group_id FROM groups").fetchdf()
-    con.close()
-
     #-- default group --
     if group_year and not group_id:
         group_id = load_groups_by_year(group_year) 
     if not group_id and not stage:
         group_id = load_default_groups()
 
-    pattern = "|".join([re.escape(b) for b in keyword_list])
-    regex_sql = f"\\b({pattern})\\b"
-
-    #-- base query --
-    query = f"""
-        SELECT clean_text, year, month, quarter
-        FROM chat
-        WHERE clean_text IS NOT NULL 
-        AND regexp_matches(lower(clean_text),'{regex_sql}','i')
-        """
-    params =[]
+    #-- filters shared by both counts --
+    period = period_sql(granularity)
+    where = f"clean_text IS NOT NULL AND {period} IN (?, ?)"
+    params = [time1, time2]
     #filter by group_id
     if group_id:
-        query += " AND group_id IN (" + ",".join(["?"] * len(group_id)) + ")"
+        where += " AND group_id IN (" + ",".join(["?"] * len(group_id)) + ")"
         params.extend(group_id)
 
-    # Filter by stage
+    # Filter by stage, evaluated today by the group_stages view
     if stage:
-        stage_ids = df_stage[df_stage["stage"] == stage]["group_id"].tolist()
-        if stage_ids:
-            query += " AND group_id IN (" + ",".join(["?"] * len(stage_ids)) + ")"
-            params.extend(stage_ids)
-    # ----- 2. Execute query -----
-    #df = con.execute(query, params).fetchdf()
-    df = query_chat(query,params)
-
-    df1 = filter_df(df,time1,granularity)
-    df2 = filter_df(df,time2,granularity)
+        where += " AND group_id IN (SELECT group_id FROM group_stages WHERE stage = ?)"
+        params.append(stage)
 
-    def count_kw(texts, keywords):
-        counter = Counter()
-        for text in texts:
-            t = text.lower()
-            for kw in keywords:
-                counter[kw] += len(re.findall(rf"\b{re.escape(kw)}(s|es)?\b", t))
-        return counter
-
-    def compute_block(df_subset):
+    # ----- 2. Execute query -----
+    # single words: unnest the token list and join the keyword variants, no regex per message
+    variants, variant_keywords, phrases = keyword_variants(keyword_list)
+    query = f"""
+        WITH kw AS (
+            SELECT unnest(?::VARCHAR[]) AS variant, unnest(?::VARCHAR[]) AS keyword
+        ),
+        tok AS (
+            SELECT {period} AS period, unnest(tokens) AS token
+            FROM chat
+            WHERE {where}
+        )
+        SELECT tok.period, kw.keyword, COUNT(*) AS count
+        FROM tok JOIN kw ON tok.token = kw.variant
+        GROUP BY ALL
+        """
+    df = query_chat(query, [variants, variant_keywords] + params)
+
+    # multi-word keywords still need a phrase match on the text
+    if phrases:
+        counts_sql = ",\n".join(
+            f"SUM(len(regexp_extract_all(clean_text, ?))) AS p{i}" for i in range(len(phrases)))
+        df_phrase = query_chat(f"""
+            SELECT {period} AS period, {counts_sql}
+            FROM chat
+            WHERE {where}
+            GROUP BY ALL
+            """, [rf"\b{re.escape(kw.lower())}(s|es)?\b" for kw in phrases] + params)
+        df_phrase.columns = ["period"] + phrases
+        df_phrase = df_phrase.melt(id_vars="period", var_name="keyword", value_name="count")
+        df = pd.concat([df, df_phrase.dropna()], ignore_index=True)
+
+    order = {kw: i for i, kw in enumerate(keyword_list)}
+
+    def compute_block(time):
+        df_subset = df[(df["period"] == time) & (df["count"] > 0)]
         if df_subset.empty:
             return {"total_mentions": 0, "keywords": []}
 
-        counts = count_kw(df_subset["clean_text"].dropna().tolist(), keyword_list)
-        result = [{"keyword": k, "count": v} for k, v in counts.items() if v > 0]
-        result.sort(key=lambda x: x["count"], reverse=True)
+        result = [{"keyword": k, "count": int(v)} for k, v in zip(df_subset["keyword"], df_subset["count"])]
+        result.sort(key=lambda x: (-x["count"], order.get(x["keyword"], 0)))
         return result
 
-    block1 = compute_block(df1)
-    block2 = compute_block(df2)
+    block1 = compute_block(time1)
+    block2 = compute_block(time2)
     return {
         "granularity":granularity,
         "compare":{
@@ -216,86 +246,89 @@ def keyword_cooccurrence(
     top_n: int = 30,                
 ):
 
-    # === 1. basic query ===
-    query = """
-    SELECT group_id, year, month, quarter,
-           row_number() over (PARTITION BY group_id ORDER BY datetime) AS row_id,
-           clean_text
-    FROM chat
-    WHERE clean_text IS NOT NULL
-    """
     params = []
+    group_sql = ""
 
     if group_year and not group_id:
         group_id = load_groups_by_year(group_year)
     if not group_id:
         group_id = load_default_groups()
     if group_id:
-        query += " AND group_id IN (" + ",".join(["?"] * len(group_id)) + ")"
+        group_sql = " AND group_id IN (" + ",".join(["?"] * len(group_id)) + ")"
         params.extend(group_id)
 
-    df = query_chat(query, params)
+    # === 1. any chat data at all ===
+    df = query_chat(f"SELECT 1 FROM chat WHERE clean_text IS NOT NULL{group_sql} LIMIT 1", params)
     if df.empty:
         return {"error": "No chat data found."}
 
-    df["clean_text"] = df["clean_text"].fillna("").astype(str)
-    # === 2.filter short msg ===
-    kw = keyword.lower()
-    df1 = filter_df(df,time1, granularity)
-    df2 = filter_df(df,time2,granularity)
+    # === 2. messages with the keyword, their tokens without the keyword ===
+    kw = keyword.lower().strip()
+    if " " in kw:
+        # phrase keyword: match and remove it on the text
+        kw_pattern = rf"\b{re.escape(kw)}\b"
+        kw_sql = "regexp_matches(clean_text, ?)"
+        tokens_sql = "string_split(regexp_replace(clean_text, ?, ' ', 'g'), ' ')"
+    else:
+        kw_pattern = kw
+        kw_sql = "list_contains(tokens, ?)"
+        tokens_sql = "list_filter(tokens, t -> t <> ?)"
+    period = period_sql(granularity)
 
-    def compute_cooccurrence(df,kw):
-        # === extract msg include keyword ===
-        df = df[df["clean_text"].str.len() >= 5]
-        df_kw = df[df["clean_text"].str.contains(rf"\b{re.escape(kw)}\b", case=False)]
-        if df_kw.empty:
-            return pd.DataFrame(columns=["word1","word2","count","pmi"])
-        texts = df_kw["clean_text"].tolist()
-        #== statistical count ===
-        cooc = defaultdict(int)
-        word_freq = Counter()
-        total_pairs = 0
-
-        for text in texts:
-            pattern_kw = rf"(?<!\w){re.escape(kw.lower())}(?!\w)"
-            clean_text = re.sub(pattern_kw, "", text.lower())
-
-            tokens = re.findall(r"\b[a-z]{3,}\b", clean_text)
-        
-            # update frequency
-            word_freq.update(tokens)
-            # only one combination
-            for a, b in itertools.combinations(sorted(set(tokens)), 2):
-                cooc[(a, b)] += 1
-                total_pairs += 1
-
-        if not cooc:
-            return pd.DataFrame(columns=["word1", "word2", "count", "pmi"])
-        # === 5. calculte pmi ===
-        result = []
-        total = total_pairs
-        for (w1, w2), c in cooc.items():
-            p_w1 = word_freq[w1] / total
-            p_w2 = word_freq[w2] / total
-            p_w1w2 = c / total
-            if p_w1w2 == 0 or p_w1 == 0 or p_w2 == 0:
-                continue
-            pmi = math.log2(p_w1w2 / (p_w1 * p_w2))
-            if pmi <= 0:
-                continue  # only keep positive relation
-            result.append((w1, w2, c, round(pmi, 4)))
-
-        if not result:
-            return pd.DataFrame(columns=["word1", "word2", "count", "pmi"])
-
-        df_result = pd.DataFrame(result, columns=["word1", "word2", "count", "pmi"])
-
-        # === 6. threshold and filter ===
-        df_result['score'] = df_result.apply(lambda r: r['pmi']*math.log2(r['count']+1),axis=1)
-        return df_result.sort_values("score", ascending=False).head(top_n)
-    
-    df1_res = compute_cooccurrence(df1,kw)
-    df2_res = compute_cooccurrence(df2,kw)
+    query = f"""
+    WITH msgs AS (
+        SELECT {period} AS period,
+               row_number() OVER () AS msg_id,
+               list_filter({tokens_sql}, t -> regexp_full_match(t, '[a-z]{{3,}}')) AS toks
+        FROM chat
+        WHERE clean_text IS NOT NULL
+          AND length(clean_text) >= 5
+          AND {period} IN (?, ?)
+          AND {kw_sql}{group_sql}
+    ),
+    words AS (
+        SELECT period, msg_id, unnest(toks) AS w FROM msgs
+    ),
+    word_freq AS (
+        SELECT period, w, COUNT(*) AS f FROM words GROUP BY ALL
+    ),
+    uniq AS (
+        SELECT DISTINCT period, msg_id, w FROM words
+    ),
+    totals AS (
+        -- every message adds n*(n-1)/2 pairs of its distinct words
+        SELECT period, SUM(n * (n - 1) / 2) AS total
+        FROM (SELECT period, msg_id, COUNT(*) AS n FROM uniq GROUP BY ALL)
+        GROUP BY period
+    ),
+    pairs AS (
+        SELECT a.period, a.w AS word1, b.w AS word2, COUNT(*) AS count
+        FROM uniq a
+        JOIN uniq b ON a.period = b.period AND a.msg_id = b.msg_id AND a.w < b.w
+        GROUP BY ALL
+    ),
+    scored AS (
+        SELECT p.period, p.word1, p.word2, p.count,
+               log2((p.count / t.total) / ((f1.f / t.total) * (f2.f / t.total))) AS pmi
+        FROM pairs p
+        JOIN totals t ON p.period = t.period
+        JOIN word_freq f1 ON p.period = f1.period AND p.word1 = f1.w
+        JOIN word_freq f2 ON p.period = f2.period AND p.word2 = f2.w
+    )
+    SELECT period, word1, word2, count, round(pmi, 4) AS pmi,
+           round(pmi, 4) * log2(count + 1) AS score
+    FROM scored
+    WHERE pmi > 0 -- only keep positive relation
+    QUALIFY row_number() OVER (PARTITION BY period ORDER BY score DESC) <= ?
+    """
+    df = query_chat(query, [kw_pattern, time1, time2, kw_pattern] + params + [top_n])
+
+    def compute_cooccurrence(time):
+        df_result = df[df["period"] == time].drop(columns="period")
+        return df_result.sort_values("score", ascending=False)
+
+    df1_res = compute_cooccurrence(time1)
+    df2_res = compute_cooccurrence(time2)
     
     return {
         "keyword": keyword,
@@ -314,9 +347,7 @@ def keyword_cooccurrence(
 @router.get("/chat-number")
 def get_groups():
     #df_stage= pd.read_csv("data/processing_output/groups.csv",dtype={"group_id":str})
-    con= duckdb.connect(DB_PATH)
-    df_stage = con.execute("SELECT group_id FROM groups").fetchdf()
-    con.close()
+    df_stage = query_chat("SELECT group_id FROM groups")
     groups = df_stage['group_id'].unique().tolist()
     result = [{'id':gid} for gid in groups]
     return{
@@ -342,14 +373,12 @@ def get_cat_brand():
     """
     Get all brand list and category list for fronted display
     """
-    con= duckdb.connect(DB_PATH)
-    df_cat = con.execute(
+    df_cat = query_chat(
         "SELECT DISTINCT category_name FROM categories"
-    ).fetchdf()
-    df_brand = con.execute(
+    )
+    df_brand = query_chat(
         "SELECT DISTINCT brand_name FROM brands"
-    ).fetchdf()
-    con.close()
+    )
     return {
         "category":df_cat["category_name"].tolist(),
         "brand":df_brand["brand_name"].tolist()
@@ -6,19 +6,17 @@ from typing import List, Optional,Literal
 import pandas as pd
 from collections import Counter, defaultdict
 from backend.data_loader import query_chat, load_default_groups,load_groups_by_year
-from backend.data_loader import get_cached_sentiment,save_sentiment_cache,update_sentiment_cache
+from backend.data_loader import get_cached_sentiments,save_sentiment_cache_many,update_sentiment_cache
+from backend.data_loader import REGEX_RULE,sentiment_model_version,sentiment_rule_hash
 
 router = APIRouter()
-DB_PATH="data/chat_cache.duckdb"
 def load_brand_keywords():
-    con= duckdb.connect(DB_PATH)
     query = """
     SELECT b.brand_name AS brand, k.keyword AS keyword
     FROM brand_keywords k 
     JOIN brands b on k.brand_id=b.brand_id
     """
-    brand_keyword_df = con.execute(query).fetchdf()
-    con.close()
+    brand_keyword_df = query_chat(query)
     return brand_keyword_df.groupby("brand")["keyword"].apply(list).to_dict()
 
 
@@ -36,6 +34,10 @@ sentiment_model = pipeline(
 with open("data/other_data/sentiment_rule.json", "r", encoding="utf-8") as f:
     CONFIG = json.load(f)["rules"]
 
+# cache entries are only valid for this model / rule file
+MODEL_VERSION = sentiment_model_version("./roberta-sentiment-finetuned")
+RULE_HASH = sentiment_rule_hash(CONFIG)
+
 def regex_override_label(text: str, base_sentiment: str) -> str:
     """based on rule.json overwrite sentiment"""
     t = text.lower()
@@ -60,39 +62,37 @@ def analyze_sentiment(texts):
     if not texts:
         return sentiment_result, detailed_examples
 
-    # check existing cache
-    cached_results = {}
-    uncached_texts = []
-    for text in texts:
-        cached = get_cached_sentiment(text)
-        if cached:
-            cached_results[text] = cached
-        else:
-            uncached_texts.append(text)
+    # check existing cache, one lookup for the whole list
+    # (entries of an older rule file are re-labelled from the stored model label, no inference)
+    cached_results = get_cached_sentiments(texts, MODEL_VERSION, RULE_HASH, relabel=regex_override_label)
+    unique_texts = list(dict.fromkeys(texts))
+    uncached_texts = [text for text in unique_texts if text not in cached_results]
 
     # Only run model inference on uncached texts
     if uncached_texts:
         preds = sentiment_model(uncached_texts, batch_size=32)
+        new_records = []
         for i, text in enumerate(uncached_texts):
             pred = preds[i][0]
             sentiment = pred["label"].lower()
             score = round(pred["score"], 3)
             rule = None
-            print("model inference")
             final_sentiment = regex_override_label(text, sentiment)
             if final_sentiment != sentiment:
-                rule = "regex overwrite"
-            save_sentiment_cache(text, final_sentiment, score, rule)
+                rule = REGEX_RULE
+            new_records.append((text, sentiment, final_sentiment, score, rule))
             cached_results[text] = {
                 "sentiment": final_sentiment,
                 "score": score,
                 "rule_applied": rule
             }
+        # all new predictions written in one transaction
+        save_sentiment_cache_many(new_records, MODEL_VERSION, RULE_HASH)
 
     # Log cache hits (for visibility)
-    for text in texts:
-        if text not in uncached_texts:
-            print("cached hit")
+    # counted over distinct texts, a repeated text is looked up / inferred once
+    print(f"sentiment: {len(unique_texts)} distinct texts, {len(unique_texts) - len(uncached_texts)} cached hit, "
+          f"{len(uncached_texts)} model inference")
     for text in texts:
         data = cached_results[text]
         sentiment_result[data["sentiment"]] += 1
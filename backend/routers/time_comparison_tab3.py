@@ -9,11 +9,10 @@ import spacy
 from backend.model_loader import kw_model,encoder
 from backend.routers.brand_tab2 import custom_keywords_dict
 from backend.data_loader import query_chat, load_default_groups,load_groups_by_year
+from backend.keyword_matcher import get_matcher, KeywordMatcher
 
 router = APIRouter()
-DB_PATH="data/chat_cache.duckdb"
 def load_cat_data():
-    con= duckdb.connect(DB_PATH)
     query = """
     SELECT 
         b.brand_name AS brand,
@@ -23,8 +22,7 @@ def load_cat_data():
     JOIN brands b ON k.brand_id = b.brand_id
     JOIN categories c ON b.category_id = c.category_id
     """
-    df_cat = con.execute(query).fetchdf()
-    con.close()
+    df_cat = query_chat(query)
     return df_cat 
 def extract_brand_context(df: pd.DataFrame, brand: str, brand_keyword_map: dict,
                           window_size: int = 6, merge_overlap: bool = True):
@@ -82,9 +80,6 @@ def count_keywords_sql(
         return [{"keyword": k, "count": 0} for k in all_keywords]
 
 
-    # register DuckDB temportary table
-    duckdb.register("df_temp", df_subset)
-
 
     # 1.  SQL-safe regex pattern
     brand_pattern = re.escape(brand.lower())
@@ -126,8 +121,7 @@ def count_keywords_sql(
     ORDER BY count DESC
     """
 
-    df_result = duckdb.sql(query).df()
-    duckdb.unregister("df_temp")
+    df_result = query_chat(query, frames={"df_temp": df_subset})
 
     return df_result.to_dict(orient="records")
 
@@ -156,7 +150,7 @@ def compare_keyword_frequency(
     query = """
     SELECT 
         group_id, year, month, quarter,
-        row_number() over (PARTITION BY group_id ORDER BY datetime) AS row_id,
+        msg_seq AS row_id,
         clean_text 
     FROM chat WHERE clean_text IS NOT NULL"""
     params = []
@@ -203,37 +197,10 @@ def compare_keyword_frequency(
 
 
 
-def _normalize_quotes(s: str) -> str:
-    if not isinstance(s, str):
-        return ""
-    return (
-        s.replace("’", "'")
-         .replace("‘", "'")
-         .replace("`", "'")
-         .lower()
-         .replace("'", "")
-         .strip()
-    )
-
-
-def _build_keyword_pattern(kw: str) -> re.Pattern:
-    k = _normalize_quotes(kw)
-    k = re.escape(k)
-    k = k.replace(r"\-", r"(?:-|\\s)")
-    k = k.replace(r"\ ", r"\s+")
-    pattern = rf"(?<!\w){k}(?!\w)"
-    return re.compile(pattern, flags=re.IGNORECASE)
-
 def count_kw(context_texts, keywords):
-    patterns = {kw: _build_keyword_pattern(kw) for kw in keywords}
-    cnt = Counter()
-    for text in context_texts:
-        t = _normalize_quotes(text)
-        for kw, patt in patterns.items():
-            matches = patt.findall(text)
-            #if patt.search(t):
-            cnt[kw] += len(matches)
-    return cnt
+    """every mention of each keyword, keywords without mention count 0"""
+    counts = get_matcher(keywords).count(context_texts, mode="occurrences")
+    return Counter({kw: counts[kw] for kw in keywords})
 
 #------share of voice--------
 @router.get("/category/time-compare/share-of-voice")
@@ -389,12 +356,8 @@ def extract_clean_brand_keywords_auto(texts, brand_name, top_k=15):
     filtered_keywords = remove_overlapping_phrases(filtered_keywords,overlap_ratio=0.5)
 
     # Step 6️⃣ count the frequency in original text
-    counts = Counter()
-    for text in texts:
-        t = text.lower()
-        for kw in filtered_keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", t):
-                counts[kw] += 1
+    # keywords of this request only, so not the cached get_matcher
+    counts = KeywordMatcher(filtered_keywords).count(texts)
 
     results = [{"word": k, "count": v} for k, v in sorted(counts.items(), key=lambda x: x[1], reverse=True)]
     return results
@@ -417,7 +380,7 @@ def compare_consumer_perception(
     query = """
     SELECT 
         group_id, clean_text, year, month, quarter,
-        row_number() over (PARTITION BY group_id ORDER BY datetime) AS row_id
+        msg_seq AS row_id
     FROM chat WHERE clean_text IS NOT NULL"""
     params = []
     # ---- Default groups ----
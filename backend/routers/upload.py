@@ -0,0 +1,107 @@
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request, Header
+from typing import Optional
+import os, uuid
+from backend.ingestion_ledger import hash_stream_to_file, find_ingested, list_ingestions
+from backend.ingestion_jobs import submit_upload, get_job, list_jobs, QueueFullError
+from backend import chunked_upload
+from backend.chunked_upload import ChunkError
+
+router = APIRouter()
+
+#----------------
+# upload chat data
+#----------------
+UPLOADED_DIR = "data/uploads"
+
+@router.post("/upload/")
+def upload_file(file:UploadFile =File(...), force:bool=False):
+    """
+    save the zip and queue it for ingestion, returns a job id immediately.
+    poll /upload/jobs/{job_id} for stage / progress / result
+    """
+    os.makedirs(UPLOADED_DIR,exist_ok=True)
+    tmp_path = os.path.join(UPLOADED_DIR,f".{uuid.uuid4().hex}.part")
+    archive_sha256 = hash_stream_to_file(file.file,tmp_path)
+    # keep the original file name (group name comes from it), one folder per content
+    uploaded_path = os.path.join(UPLOADED_DIR,archive_sha256[:16],os.path.basename(file.filename))
+    os.makedirs(os.path.dirname(uploaded_path),exist_ok=True)
+    os.replace(tmp_path,uploaded_path)
+
+    return queue_ingestion(uploaded_path,file.filename,archive_sha256,force)
+
+def queue_ingestion(uploaded_path:str, file_name:str, archive_sha256:str, force:bool=False):
+    """skip archives already in the ledger, otherwise hand off to the ingestion job queue"""
+    # same archive already ingested -> nothing to recompute
+    if not force:
+        existing = find_ingested(archive_sha256=archive_sha256)
+        if existing:
+            return {"status":"duplicate","group_id":existing["group_id"],"group_year":existing["group_year"],
+                    "ingested_at":existing["ingested_at"]}
+    try:
+        job = submit_upload(uploaded_path,file_name,archive_sha256,force)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"status":"queued","job_id":job["job_id"]}
+
+@router.get("/upload/jobs/{job_id}")
+def upload_job_status(job_id:str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} Not Found")
+    return job
+
+@router.get("/upload/jobs")
+def upload_jobs(limit:int=50):
+    jobs = list_jobs(limit)
+    return {"total":len(jobs),"jobs":jobs}
+
+@router.get("/upload/ledger")
+def upload_ledger(group_id:Optional[str]=None, limit:int=100):
+    """what was ingested and when (newest first)"""
+    df = list_ingestions(group_id,limit)
+    return {"total":len(df),"ingestions":df.to_dict(orient="records")}
+
+#----------------
+# chunked / resumable upload
+#----------------
+@router.post("/upload/chunked/init")
+def chunked_upload_init(file_name:str, total_size:int, chunk_size:Optional[int]=None, sha256:Optional[str]=None):
+    """
+    start a chunked upload (or resume the unfinished one of the same file when sha256 is given).
+    returns upload_id, chunk_size, total_chunks and the chunks already received
+    """
+    try:
+        return chunked_upload.init_upload(file_name,total_size,chunk_size,sha256)
+    except ChunkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/upload/chunked/{upload_id}")
+def chunked_upload_status(upload_id:str):
+    """received / missing chunks, next_index is where to resume"""
+    try:
+        return chunked_upload.upload_status(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} Not Found")
+
+@router.put("/upload/chunked/{upload_id}/{index}")
+async def chunked_upload_put(upload_id:str, index:int, request:Request,
+                             x_chunk_sha256:Optional[str]=Header(None)):
+    """raw chunk bytes as request body, X-Chunk-SHA256 header holds the chunk sha256 (hex)"""
+    try:
+        return await chunked_upload.write_chunk(upload_id,index,request.stream(),x_chunk_sha256)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} Not Found")
+    except ChunkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/upload/chunked/{upload_id}/complete")
+def chunked_upload_complete(upload_id:str, force:bool=False):
+    """assemble the chunks into the archive and queue it for ingestion (same response as /upload/)"""
+    try:
+        file_name = chunked_upload.load_session(upload_id)["file_name"]
+        archive_path,archive_sha256 = chunked_upload.assemble_upload(upload_id,UPLOADED_DIR)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} Not Found")
+    except ChunkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return queue_ingestion(archive_path,file_name,archive_sha256,force)
@@ -0,0 +1,20 @@
+# repo root conftest: pytest puts this directory on sys.path, so tests can import backend
+import queue
+import threading
+
+import duckdb
+import pytest
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """db_pool on an in-memory database (2 read cursors, 0.1s timeout), data/chat_cache.duckdb is never opened"""
+    from backend import db_pool
+    monkeypatch.setattr(db_pool, "_db", duckdb.connect(":memory:"))
+    monkeypatch.setattr(db_pool, "_idle", queue.LifoQueue())
+    monkeypatch.setattr(db_pool, "_slots", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(db_pool, "_writer", None)
+    monkeypatch.setattr(db_pool, "POOL_SIZE", 2)
+    monkeypatch.setattr(db_pool, "POOL_TIMEOUT", 0.1)
+    yield db_pool
+    db_pool._db.close()
@@ -15,8 +15,14 @@ function buildURL(endpoint, params = {}) {
     return url;
 }
 
-//upload file (zip or txt)
+const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+
+//upload file (zip or txt), large files go through the resumable chunked upload
 async function uploadFile(file) {
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        return await uploadFileChunked(file);
+    }
     const url = new URL(`${BASE_URL}/upload/`);
     const formData = new FormData();
     formData.append('file', file);
@@ -30,7 +36,84 @@ async function uploadFile(file) {
         throw new Error(`Error ${response.status}: ${response.statusText}`);
     }
 
-    return await response.json();
+    const result = await response.json();
+    if (!result.job_id) {
+        // duplicate upload, already ingested
+        return result;
+    }
+    return await waitForUploadJob(result.job_id);
+}
+
+async function sha256Hex(buffer) {
+    const digest = await crypto.subtle.digest("SHA-256", buffer);
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, "0")).join("");
+}
+
+//chunked upload: init -> PUT missing chunks -> complete, upload_id is remembered so a retry resumes
+async function uploadFileChunked(file, chunkSize = UPLOAD_CHUNK_SIZE) {
+    const resumeKey = `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+    let session = null;
+
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        const response = await fetch(new URL(`${BASE_URL}/upload/chunked/${savedId}`), { method: "GET" });
+        if (response.ok) {
+            session = await response.json();
+        }
+    }
+    if (!session) {
+        const url = buildURL("/upload/chunked/init", { file_name: file.name, total_size: file.size, chunk_size: chunkSize });
+        const response = await fetch(url, { method: "POST" });
+        if (!response.ok) {
+            throw new Error(`Error ${response.status}: ${response.statusText}`);
+        }
+        session = await response.json();
+        localStorage.setItem(resumeKey, session.upload_id);
+    }
+
+    for (const index of session.missing) {
+        const start = index * session.chunk_size;
+        const chunk = await file.slice(start, start + session.chunk_size).arrayBuffer();
+        const response = await fetch(new URL(`${BASE_URL}/upload/chunked/${session.upload_id}/${index}`), {
+            method: "PUT",
+            headers: { "X-Chunk-SHA256": await sha256Hex(chunk) },
+            body: chunk
+        });
+        if (!response.ok) {
+            throw new Error(`Error ${response.status}: ${response.statusText}`);
+        }
+    }
+
+    const response = await fetch(new URL(`${BASE_URL}/upload/chunked/${session.upload_id}/complete`), { method: "POST" });
+    if (!response.ok) {
+        throw new Error(`Error ${response.status}: ${response.statusText}`);
+    }
+    localStorage.removeItem(resumeKey);
+
+    const result = await response.json();
+    if (!result.job_id) {
+        return result;
+    }
+    return await waitForUploadJob(result.job_id);
+}
+
+//poll background ingestion job until it finishes
+async function waitForUploadJob(jobId, intervalMs = 1000) {
+    const url = new URL(`${BASE_URL}/upload/jobs/${jobId}`);
+    while (true) {
+        const response = await fetch(url, { method: "GET" });
+        if (!response.ok) {
+            throw new Error(`Error ${response.status}: ${response.statusText}`);
+        }
+        const job = await response.json();
+        if (job.status === "done" || job.status === "duplicate") {
+            return { status: job.status, ...job.result };
+        }
+        if (job.status === "failed") {
+            throw new Error(job.error || "Ingestion failed");
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
 }
 
 //group chat number
@@ -631,6 +714,8 @@ async function dropList(params = {}) {
 
 export {
     uploadFile,
+    waitForUploadJob,
+    uploadFileChunked,
     groupChat,
     availableYears,
     keywordFrequency,
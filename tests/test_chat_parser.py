@@ -0,0 +1,76 @@
+"""
+chat_parser: format sniffing, multi-line messages and system messages for android / ios exports.
+run from the repo root: python -m pytest tests
+"""
+from datetime import datetime
+
+from backend.chat_parser import sniff_format, iter_message_frames, parse_lines
+
+ANDROID = [
+    "06/01/2025, 13:03 - Messages and calls are end-to-end encrypted.",
+    "06/01/2025, 13:03 - +65 9000 0000 joined using this group's invite link",
+    "06/01/2025, 13:04 - +65 9635 7039: Hi there",
+    "anyone tried huggies?",
+    "",
+    "06/01/2025, 13:05 - Alice: same here",
+    "07/01/2025, 09:30 - Bob: tmr then",
+]
+
+IOS = [
+    "‎[06/01/25, 13:03:10] SG Mums: ‎Messages and calls are end-to-end encrypted.",
+    "[06/01/25, 13:03:10] ~ Alice: Hi there",
+    "second line",
+    "‎[06/01/25, 13:03:40] ~ Alice: ‎image omitted",
+    "[06/01/25, 13:04:00] ~ Bob: ‎Your security code with Alice changed.",
+    "[06/01/25, 13:05:59] ~ Bob: Bob joined using this group's invite link",
+    "[07/01/25, 09:30:00] ~ Bob: ok",
+]
+
+
+def test_sniff_android():
+    assert sniff_format(ANDROID) == ("android", "%d/%m/%Y, %H:%M")
+
+
+def test_sniff_ios():
+    assert sniff_format(IOS) == ("ios", "%d/%m/%y, %H:%M:%S")
+
+
+def test_sniff_no_messages():
+    assert sniff_format(["hello", "", "not a chat"]) is None
+    assert parse_lines(["hello"]).empty
+
+
+def test_android_multiline_and_system_messages():
+    df = parse_lines(ANDROID)
+    assert df["user"].tolist() == ["+65 9635 7039", "Alice", "Bob"]
+    assert df["text"].tolist() == ["Hi there\nanyone tried huggies?", "same here", "tmr then"]
+    assert df["datetime"].tolist() == [datetime(2025, 1, 6, 13, 4), datetime(2025, 1, 6, 13, 5),
+                                       datetime(2025, 1, 7, 9, 30)]
+
+
+def test_ios_multiline_and_system_messages():
+    df = parse_lines(IOS)
+    assert df["user"].tolist() == ["Alice", "Bob"]
+    assert df["text"].tolist() == ["Hi there\nsecond line", "ok"]
+    assert df["datetime"].tolist() == [datetime(2025, 1, 6, 13, 3, 10), datetime(2025, 1, 7, 9, 30)]
+
+
+def test_lines_before_first_message_dropped():
+    df = parse_lines(["exported chat", "no header here"] + ANDROID[2:])
+    assert df["text"].iloc[0] == "Hi there\nanyone tried huggies?"
+
+
+def test_multiline_message_never_split_across_batches():
+    lines = ["06/01/2025, 13:00 - Alice: start"]
+    lines += [f"line {i}" for i in range(7)]
+    lines += ["06/01/2025, 13:01 - Bob: next"]
+    frames = list(iter_message_frames(lines, batch_size=3))
+    texts = [t for df in frames for t in df["text"]]
+    assert texts == ["start\n" + "\n".join(f"line {i}" for i in range(7)), "next"]
+
+
+def test_batches_give_the_same_result():
+    lines = ANDROID * 20
+    whole = parse_lines(lines)
+    batched = [t for df in iter_message_frames(lines, batch_size=4) for t in df["text"]]
+    assert batched == whole["text"].tolist()
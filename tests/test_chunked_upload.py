@@ -0,0 +1,126 @@
+"""
+chunked_upload: resume an unfinished upload, chunk / file checksum checks, assembling the archive.
+run from the repo root: python -m pytest tests
+"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from backend.chunked_upload import (init_upload, upload_status, write_chunk, assemble_upload, ChunkError,
+                                    CHUNKED_DIR)
+
+CHUNK_SIZE = 1000
+DATA = os.urandom(2500)   # 3 chunks, the last one 500 bytes
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk(index: int) -> bytes:
+    return DATA[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+
+
+async def _stream(data: bytes, piece: int = 300):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+def send(upload_id: str, index: int, data: bytes = None, checksum: str = None) -> dict:
+    data = chunk(index) if data is None else data
+    return asyncio.run(write_chunk(upload_id, index, _stream(data), checksum or sha(data)))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # uploads live under data/, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def start() -> dict:
+    return init_upload("WhatsApp Chat - 2025 JAN SG Mums.zip", len(DATA), chunk_size=CHUNK_SIZE, sha256=sha(DATA))
+
+
+def test_init_lists_missing_chunks():
+    status = start()
+    assert status["total_chunks"] == 3
+    assert status["missing"] == [0, 1, 2] and status["next_index"] == 0 and not status["complete"]
+
+
+def test_init_resumes_unfinished_upload():
+    first = start()
+    send(first["upload_id"], 0)
+    send(first["upload_id"], 2)
+    resumed = start()
+    assert resumed["upload_id"] == first["upload_id"]
+    assert resumed["received"] == [0, 2]
+    assert resumed["missing"] == [1] and resumed["next_index"] == 1
+
+
+def test_other_file_gets_a_new_session():
+    first = start()
+    other = init_upload("WhatsApp Chat - 2025 JAN SG Mums.zip", len(DATA), chunk_size=CHUNK_SIZE,
+                        sha256=sha(b"other"))
+    assert other["upload_id"] != first["upload_id"]
+
+
+def test_chunk_checksum_mismatch_is_not_stored():
+    upload_id = start()["upload_id"]
+    with pytest.raises(ChunkError, match="checksum"):
+        send(upload_id, 1, checksum=sha(b"something else"))
+    assert upload_status(upload_id)["received"] == []
+    # no temp file left behind
+    chunk_dir = os.path.join(CHUNKED_DIR, upload_id, "chunks")
+    assert os.listdir(chunk_dir) == []
+
+
+def test_chunk_size_checked():
+    upload_id = start()["upload_id"]
+    with pytest.raises(ChunkError):
+        send(upload_id, 0, data=chunk(0) + b"x")
+    with pytest.raises(ChunkError):
+        send(upload_id, 2, data=chunk(2)[:-1])
+    with pytest.raises(ChunkError):
+        send(upload_id, 3, data=b"")
+
+
+def test_resend_replaces_chunk():
+    upload_id = start()["upload_id"]
+    send(upload_id, 0)
+    assert send(upload_id, 0) == {"upload_id": upload_id, "index": 0, "size": CHUNK_SIZE}
+    assert upload_status(upload_id)["received"] == [0]
+
+
+def test_assemble():
+    upload_id = start()["upload_id"]
+    for index in (2, 0, 1):
+        send(upload_id, index)
+    path, archive_sha = assemble_upload(upload_id, "data/uploads", chunk_read_size=128)
+    assert archive_sha == sha(DATA)
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert os.path.basename(path) == "WhatsApp Chat - 2025 JAN SG Mums.zip"
+    # session removed once assembled
+    assert not os.path.exists(os.path.join(CHUNKED_DIR, upload_id))
+
+
+def test_assemble_with_missing_chunks():
+    upload_id = start()["upload_id"]
+    send(upload_id, 0)
+    with pytest.raises(ChunkError, match="missing"):
+        assemble_upload(upload_id, "data/uploads")
+
+
+def test_assemble_checks_file_checksum():
+    status = init_upload("WhatsApp Chat - 2025 JAN SG Mums.zip", len(DATA), chunk_size=CHUNK_SIZE,
+                         sha256=sha(b"not the data"))
+    for index in range(3):
+        send(status["upload_id"], index)
+    with pytest.raises(ChunkError, match="checksum"):
+        assemble_upload(status["upload_id"], "data/uploads")
+    # no half written archive, the chunks are kept
+    assert os.listdir("data/uploads") == ["chunked"]
+    assert upload_status(status["upload_id"])["complete"]
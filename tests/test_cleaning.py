@@ -0,0 +1,67 @@
+"""
+batch cleaning (_clean_batch / clean_texts) must give exactly what the per-row clean_text gives.
+run from the repo root: python -m pytest tests
+"""
+from backend.cleaning import _clean_batch, clean_text, clean_texts, check_clean_equivalence, compile_slang
+
+SLANG = {
+    "u": "you",
+    "tmr": "tomorrow",
+    "bday": "birthday",
+    "BB": "baby",
+    "see u": "see you",          # multi-word, longer than "u"
+    "idk": "i don't know",       # brings punctuation back after the punctuation step
+    "ty": "thank you",
+    "asap": "as soon as possible",
+}
+
+CORPUS = [
+    # empty / missing
+    None, "", "   ", float("nan"), "\n\n",
+    # whatsapp markers
+    "<Media omitted>", "This message was deleted", "ok This message was edited",
+    # links, emails, numbers
+    "check http://example.com/a?b=1 and www.shop.my/deal now",
+    "mail me at mama.bear@gmail.com pls", "call 0123456789 or 012-345 6789",
+    "size 3 or s-26 gold, 2x cheaper", "rm12.90 only", "x2 24h 3rd",
+    # emoji and other unicode
+    "so cute 😍😍😍 !!!", "baby 👶🏻 girl 🎉", "“quoted” ‘single’ text", "café naïve Ümlaut",
+    "中文 mixed with english", "tab\tseparated\ttext", "non\u00a0breaking space",
+    # repeated chars
+    "sooooo goooood", "hahahaha", "!!!???...", "aaa bbb ccc",
+    # slang, single and multi word, mixed case
+    "see u tmr", "See U TMR", "see uuu tmr!!", "u u u", "bb bday party", "Idk lah", "ty ty asap",
+    "you", "use your bday", "seeu", "tmrw",
+    # stopwords only, and a mix
+    "i am the one", "what is this about", "The BEST diapers for my baby",
+    # punctuation the tokenizer splits
+    "don't can't won't", "mother's day", "(brackets) [square] {curly}", "a/b c-d e_f",
+    "end.", "dr. smith vs. mr. jones", "price: $10, 20%!",
+    # not a string
+    12345, 3.14,
+]
+
+
+def test_clean_texts_matches_clean_text():
+    assert check_clean_equivalence(CORPUS, SLANG) == []
+
+
+def test_clean_texts_matches_clean_text_without_slang():
+    assert check_clean_equivalence(CORPUS, None) == []
+
+
+def test_clean_batch_matches_clean_text():
+    values = [t for t in CORPUS if isinstance(t, str)]
+    matcher = compile_slang(SLANG)
+    assert _clean_batch(values, SLANG) == [clean_text(t, SLANG, matcher) for t in values]
+
+
+def test_clean_texts_with_cache_matches_clean_text(tmp_path, monkeypatch):
+    # the clean cache lives under data/, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    expected = [clean_text(t, SLANG) for t in CORPUS]
+    stats = {"rows": 0, "unique": 0, "cache_hits": 0, "cleaned": 0}
+    assert clean_texts(CORPUS, SLANG, cache=True, stats=stats) == expected
+    # second run is served from the cache
+    assert clean_texts(CORPUS, SLANG, cache=True, stats=stats) == expected
+    assert stats["cache_hits"] == stats["cleaned"]
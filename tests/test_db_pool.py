@@ -0,0 +1,86 @@
+"""
+db_pool: read cursors are read-only and bounded, PoolTimeout when all are in use or the writer is busy.
+runs on an in-memory database (memory_db in conftest.py).
+run from the repo root: python -m pytest tests
+"""
+import threading
+
+import pytest
+
+from backend.db_pool import read_cursor, write_connection, PoolTimeout, ReadOnlyError
+
+
+@pytest.fixture
+def pool(memory_db):
+    with write_connection() as con:
+        con.execute("CREATE TABLE t AS SELECT range AS x FROM range(10)")
+    return memory_db
+
+
+def test_read_cursor_runs_queries(pool):
+    with read_cursor() as cur:
+        assert cur.execute("SELECT count(*) FROM t WHERE x > ?", [4]).fetchone() == (5,)
+        assert cur.sql("SELECT max(x) FROM t").fetchone() == (9,)
+        assert cur.execute("WITH y AS (SELECT x FROM t) SELECT min(x) FROM y").fetchone() == (0,)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM t",
+    "DROP TABLE t",
+    "CREATE TABLE u (a INT)",
+    "INSERT INTO t VALUES (1)",
+    "SELECT 1; DELETE FROM t",
+])
+def test_read_cursor_refuses_writes(pool, sql):
+    with pytest.raises(ReadOnlyError):
+        with read_cursor() as cur:
+            cur.execute(sql)
+    with read_cursor() as cur:
+        assert cur.execute("SELECT count(*) FROM t").fetchone() == (10,)
+
+
+def test_pool_timeout_when_all_cursors_in_use(pool):
+    with read_cursor(), read_cursor():
+        with pytest.raises(PoolTimeout):
+            with read_cursor():
+                pass
+    # free again once returned
+    with read_cursor() as cur:
+        assert cur.execute("SELECT 1").fetchone() == (1,)
+    assert pool.pool_stats()["read"]["timeouts"] >= 1
+
+
+def test_cursors_are_reused(pool):
+    with read_cursor() as cur:
+        first = cur._cursor
+    with read_cursor() as cur:
+        assert cur._cursor is first
+
+
+def test_writer_busy_in_another_thread(pool):
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_writer():
+        with write_connection():
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_writer)
+    thread.start()
+    try:
+        holding.wait(5)
+        with pytest.raises(PoolTimeout):
+            with write_connection():
+                pass
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_writer_is_reentrant_in_the_same_thread(pool):
+    with write_connection() as outer:
+        with write_connection() as inner:
+            assert inner is outer
+            inner.execute("INSERT INTO t VALUES (10)")
+    with read_cursor() as cur:
+        assert cur.execute("SELECT count(*) FROM t").fetchone() == (11,)
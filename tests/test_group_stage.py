@@ -0,0 +1,58 @@
+"""
+group_stage macro (duckdb, evaluated at query time) must give the stage get_stage gives in python.
+run from the repo root: python -m pytest tests
+"""
+import calendar
+from datetime import datetime, date
+
+import duckdb
+import pytest
+
+from backend.group_stage import STAGE_MACRO_SQL, create_stage_views, get_stage, parse_group_name
+
+# every group month from 2019 to 2027
+GROUP_NAMES = [f"{year} {calendar.month_abbr[month].upper()} SG Mums"
+               for year in range(2019, 2028) for month in range(1, 13)]
+# first, middle and last day of a few months
+TODAYS = [date(2025, 1, 1), date(2025, 1, 15), date(2025, 1, 31), date(2025, 2, 28),
+          date(2024, 2, 29), date(2025, 6, 2), date(2025, 12, 31), date(2026, 3, 1)]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect(":memory:")
+    con.execute(STAGE_MACRO_SQL)
+    yield con
+    con.close()
+
+
+def test_parse_group_name():
+    assert parse_group_name("2025 DEC SG Mummys") == datetime(2025, 12, 1)
+    assert parse_group_name("2025 Sept group") is None
+    assert parse_group_name("SG Mums") is None
+
+
+@pytest.mark.parametrize("today", TODAYS, ids=str)
+def test_macro_matches_get_stage(con, today):
+    rows = [(name, parse_group_name(name).date()) for name in GROUP_NAMES]
+    stages = con.execute(
+        "SELECT group_stage(due_date, ?::DATE) FROM (SELECT unnest(?) AS due_date, generate_subscripts(?, 1) AS i) "
+        "ORDER BY i", [today, [d for _, d in rows], [d for _, d in rows]]).fetchall()
+    today_dt = datetime(today.year, today.month, today.day)
+    expected = [get_stage(name, today_dt) for name, _ in rows]
+    assert [s for s, in stages] == expected
+
+
+def test_unknown_due_date(con):
+    assert con.execute("SELECT group_stage(NULL::DATE, current_date)").fetchone() == ("Unknown",)
+
+
+def test_group_stages_view(con):
+    con.execute("CREATE TABLE groups (group_id VARCHAR, group_name VARCHAR, due_date DATE, stage VARCHAR)")
+    con.execute("INSERT INTO groups VALUES ('202501', '2025 JAN SG Mums', DATE '2025-01-01', 'stale')")
+    create_stage_views(con)
+    # the stored stage column is dropped, the view computes it against current_date
+    columns = [c for c, in con.execute("SELECT column_name FROM (DESCRIBE groups)").fetchall()]
+    assert "stage" not in columns
+    stage, = con.execute("SELECT stage FROM group_stages").fetchone()
+    assert stage == get_stage("2025 JAN SG Mums")
@@ -0,0 +1,114 @@
+"""
+delta re-upload: with the group watermark only the new messages are parsed / cleaned and appended,
+a changed history (or files out of sync with the watermark) falls back to a full re-ingest.
+runs in a temp dir (data/ paths are relative) on an in-memory database (memory_db in conftest.py).
+run from the repo root: python -m pytest tests
+"""
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+import pytest
+
+from backend.ingestion_second import ingest_zip, group_parquet_path
+from backend.ingestion_ledger import save_watermark, get_watermark
+
+ZIP_NAME = "WhatsApp Chat - 2025 JAN SG Mums.zip"
+START = datetime(2025, 1, 6, 13, 0)
+
+
+def chat_lines(n: int, changed: int = None) -> list:
+    lines = []
+    for i in range(n):
+        dt = START + timedelta(minutes=i)
+        text = "edited message" if i == changed else f"message {i} about huggies diapers"
+        lines.append(f"{dt:%d/%m/%Y}, {dt:%H:%M} - Alice: {text}")
+        if i % 5 == 0:
+            lines.append("second line")
+    return lines
+
+
+def write_zip(folder, lines) -> str:
+    path = os.path.join(folder, ZIP_NAME)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("WhatsApp Chat with SG Mums.txt", "\n".join(lines) + "\n")
+    return path
+
+
+def upload(tmp_path, lines, watermark=None) -> dict:
+    result = ingest_zip(write_zip(tmp_path, lines), clean=True, watermark=watermark)
+    save_watermark(result["group_id"], result["group_year"], result["last_datetime"],
+                   result["content_hash"], result["messages"])
+    return result
+
+
+def rows(path: str):
+    return pq.read_table(path, columns=["msg_seq", "text"]).to_pydict()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, memory_db):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+STRUCTURE = "data/processing_output/structure_chat/2025/group_202501.parquet"
+CLEAN = "data/processing_output/clean_chat_df/2025/group_202501.parquet"
+
+
+def test_first_upload_is_full_and_sets_watermark(workdir):
+    assert get_watermark("202501") is None
+    result = upload(workdir, chat_lines(20))
+    assert result["mode"] == "full" and result["messages"] == 20
+    watermark = get_watermark("202501")
+    assert watermark["last_datetime"] == START + timedelta(minutes=19)
+    assert watermark["messages"] == 20 and watermark["content_hash"] == result["content_hash"]
+
+
+def test_reupload_with_new_messages_appends_only_those(workdir):
+    upload(workdir, chat_lines(20))
+    result = upload(workdir, chat_lines(30), watermark=get_watermark("202501"))
+    assert result["mode"] == "delta"
+    assert result["messages"] == 30 and result["new_messages"] == 10
+    assert result["clean_rows"] == 10
+
+    structure = rows(STRUCTURE)
+    assert structure["msg_seq"] == list(range(1, 31))
+    assert structure["text"][25] == "message 25 about huggies diapers\nsecond line"
+    assert len(rows(CLEAN)["text"]) == 30
+    # delta files are removed once appended
+    assert not [f for f in os.listdir(os.path.dirname(STRUCTURE)) if f.endswith(".delta")]
+    assert get_watermark("202501")["last_datetime"] == START + timedelta(minutes=29)
+
+
+def test_delta_gives_the_same_files_as_a_full_ingest(workdir):
+    upload(workdir, chat_lines(20))
+    upload(workdir, chat_lines(30), watermark=get_watermark("202501"))
+    delta_structure, delta_clean = rows(STRUCTURE), rows(CLEAN)
+    upload(workdir, chat_lines(30))
+    assert rows(STRUCTURE) == delta_structure
+    assert rows(CLEAN) == delta_clean
+
+
+def test_same_export_again_adds_nothing(workdir):
+    upload(workdir, chat_lines(20))
+    result = upload(workdir, chat_lines(20), watermark=get_watermark("202501"))
+    assert result["mode"] == "delta" and result["new_messages"] == 0
+    assert len(rows(STRUCTURE)["text"]) == 20
+
+
+def test_changed_history_falls_back_to_full(workdir):
+    upload(workdir, chat_lines(20))
+    result = upload(workdir, chat_lines(30, changed=3), watermark=get_watermark("202501"))
+    assert result["mode"] == "full" and result["new_messages"] == 30
+    assert rows(STRUCTURE)["text"][3] == "edited message"
+
+
+def test_stored_file_out_of_sync_with_watermark_falls_back_to_full(workdir):
+    upload(workdir, chat_lines(20))
+    watermark = get_watermark("202501")
+    os.remove(group_parquet_path("202501", "2025"))
+    result = upload(workdir, chat_lines(30), watermark=watermark)
+    assert result["mode"] == "full"
+    assert len(rows(STRUCTURE)["text"]) == 30
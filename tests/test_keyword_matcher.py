@@ -0,0 +1,56 @@
+"""
+keyword_matcher: whole words, hyphen / space equivalence, quotes and plural forms.
+run from the repo root: python -m pytest tests
+"""
+from backend.keyword_matcher import KeywordMatcher, get_matcher, plural_forms
+
+
+def test_whole_words_only():
+    matcher = KeywordMatcher(["nan"])
+    assert matcher.count(["nan pro 1", "banana", "NAN!", "nanny"]) == {"nan": 2}
+
+
+def test_hyphen_and_space_are_the_same():
+    matcher = KeywordMatcher(["car-seat", "s 26"])
+    counts = matcher.count(["new car seat", "car-seat review", "carseat", "s-26 gold", "s26"])
+    assert counts == {"car-seat": 2, "s 26": 1}
+
+
+def test_quotes_and_apostrophes_ignored():
+    matcher = KeywordMatcher(["mother's day"])
+    assert matcher.count(["Happy Mother’s Day", "mothers day sale", "mother day"]) == {"mother's day": 2}
+
+
+def test_plural_forms():
+    assert plural_forms("diaper") == {"diaper", "diapers", "diaperes"}
+    assert "babies" in plural_forms("baby")
+    assert "toies" not in plural_forms("toy")
+
+
+def test_plurals_only_when_asked():
+    texts = ["2 diapers left", "one diaper", "babies sleep", "baby bottles"]
+    assert KeywordMatcher(["diaper", "baby"]).count(texts) == {"diaper": 1, "baby": 1}
+    assert KeywordMatcher(["diaper", "baby"], plurals=True).count(texts) == {"diaper": 2, "baby": 2}
+
+
+def test_plural_of_last_word_of_multiword_keyword():
+    matcher = KeywordMatcher(["car seat"], plurals=True)
+    assert matcher.count(["car seats on sale", "cars seat"]) == {"car seat": 1}
+
+
+def test_plural_that_is_itself_a_keyword():
+    # "news" is its own keyword, it does not also count as a plural of "new"
+    matcher = KeywordMatcher(["new", "news"], plurals=True)
+    assert matcher.count(["any news?", "brand new", "news news"]) == {"news": 2, "new": 1}
+
+
+def test_occurrences_and_overlaps():
+    matcher = KeywordMatcher(["milk", "milk powder"])
+    text = "milk powder or fresh milk"
+    assert matcher.count([text], mode="occurrences") == {"milk": 2, "milk powder": 1}
+    assert matcher.count([text]) == {"milk": 1, "milk powder": 1}
+
+
+def test_get_matcher_cached_per_keyword_set():
+    assert get_matcher(["a", "b"]) is get_matcher(["b", "a", "a"])
+    assert get_matcher(["a", "b"]) is not get_matcher(["a", "b"], plurals=True)
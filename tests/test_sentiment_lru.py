@@ -0,0 +1,68 @@
+"""
+SentimentLRU: byte bound, lru order, rule hash / manual labels and the invalidate generation.
+run from the repo root: python -m pytest tests
+"""
+from backend.data_loader import SentimentLRU, _ENTRY_OVERHEAD
+
+RESULT = {"sentiment": "positive", "score": 0.9, "rule_applied": ""}
+ENTRY_BYTES = _ENTRY_OVERHEAD + 4 + len("positive")   # 4 char texts below
+
+
+def test_bytes_bound_evicts_least_recently_used():
+    lru = SentimentLRU(max_bytes=3 * ENTRY_BYTES)
+    for i in range(3):
+        lru.put((i, "m1"), "r1", False, RESULT, f"t{i:03d}")
+    assert lru.bytes == 3 * ENTRY_BYTES
+    assert lru.get((0, "m1"), "r1") == RESULT     # 0 is now the most recent
+    lru.put((3, "m1"), "r1", False, RESULT, "t003")
+    assert lru.bytes <= lru.max_bytes
+    assert lru.get((1, "m1"), "r1") is None       # 1 was the oldest
+    assert lru.get((0, "m1"), "r1") == RESULT
+    stats = lru.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 1
+
+
+def test_replacing_an_entry_does_not_count_twice():
+    lru = SentimentLRU(max_bytes=10 * ENTRY_BYTES)
+    lru.put((1, "m1"), "r1", False, RESULT, "t001")
+    lru.put((1, "m1"), "r1", False, RESULT, "t001")
+    assert lru.bytes == ENTRY_BYTES
+
+
+def test_returned_result_is_a_copy():
+    lru = SentimentLRU(max_bytes=10 * ENTRY_BYTES)
+    lru.put((1, "m1"), "r1", False, RESULT, "t001")
+    lru.get((1, "m1"), "r1")["sentiment"] = "negative"
+    assert lru.get((1, "m1"), "r1")["sentiment"] == "positive"
+
+
+def test_rule_hash_mismatch_is_a_miss_unless_manual():
+    lru = SentimentLRU(max_bytes=10 * ENTRY_BYTES)
+    lru.put((1, "m1"), "r1", False, RESULT, "t001")
+    lru.put((2, "m1"), "r1", True, RESULT, "t002")
+    assert lru.get((1, "m1"), "r2") is None
+    assert lru.get((2, "m1"), "r2") == RESULT
+
+
+def test_invalidate_drops_every_model_version_and_bumps_generation():
+    lru = SentimentLRU(max_bytes=10 * ENTRY_BYTES)
+    lru.put((1, "m1"), "r1", False, RESULT, "t001")
+    lru.put((1, "m2"), "r1", False, RESULT, "t001")
+    lru.put((2, "m1"), "r1", False, RESULT, "t002")
+    generation = lru.generation
+    lru.invalidate(1)
+    assert lru.generation == generation + 1
+    assert lru.get((1, "m1"), "r1") is None and lru.get((1, "m2"), "r1") is None
+    assert lru.get((2, "m1"), "r1") == RESULT
+    assert lru.bytes == ENTRY_BYTES
+
+
+def test_put_from_before_invalidate_is_ignored():
+    # a row read from sentiment_cache before a manual relabel must not come back into the lru
+    lru = SentimentLRU(max_bytes=10 * ENTRY_BYTES)
+    generation = lru.generation
+    lru.invalidate(1)
+    lru.put((1, "m1"), "r1", False, RESULT, "t001", generation=generation)
+    assert lru.get((1, "m1"), "r1") is None
+    lru.put((1, "m1"), "r1", False, RESULT, "t001", generation=lru.generation)
+    assert lru.get((1, "m1"), "r1") == RESULT